@@ -1,17 +1,18 @@
 # -*- coding: utf-8 -*-
 import re
 import time
-import requests
 from threading import Thread
 from urllib.parse import quote
 from caches.main_cache import cache_object
 from caches.settings_cache import get_setting, set_setting
 from modules.utils import copy2clip, make_qrcode, make_tinyurl
 from modules.source_utils import supported_video_extensions, seas_ep_filter, extras
-from modules.kodi_utils import progress_dialog, notification, hide_busy_dialog, show_busy_dialog, confirm_dialog, sleep, ok_dialog, progress_dialog, \
+from modules.kodi_utils import make_session, progress_dialog, notification, hide_busy_dialog, show_busy_dialog, confirm_dialog, sleep, ok_dialog, progress_dialog, \
 								notification, hide_busy_dialog
 # from modules.kodi_utils import logger
 
+session = make_session('https://api.alldebrid.com/v4/')
+
 class AllDebridAPI:
 	def __init__(self):
 		self.token = get_setting('fenlight.ad.token', 'empty_setting')
@@ -22,7 +23,7 @@ class AllDebridAPI:
 	def auth(self):
 		self.token = ''
 		url = self.base_url + 'pin/get?agent=%s' % self.user_agent
-		response = requests.get(url, timeout=20).json()
+		response = session.get(url, timeout=20).json()
 		response = response['data']
 		expires_in = int(response['expires_in'])
 		poll_url = response['check_url']
@@ -41,7 +42,7 @@ class AllDebridAPI:
 		sleep(2000)
 		while not progressDialog.iscanceled() and time_passed < expires_in and not self.token:
 			sleep(1000 * sleep_interval)
-			response = requests.get(poll_url, timeout=20).json()
+			response = session.get(poll_url, timeout=20).json()
 			response = response['data']
 			activated = response['activated']
 			if not activated:
@@ -198,7 +199,7 @@ class AllDebridAPI:
 			if self.token in ('empty_setting', ''): return None
 			url = self.base_url + url + '?agent=%s&apikey=%s' % (self.user_agent, self.token) + url_append
 			if 'magnet/status' in url: url = url.replace('v4', 'v4.1')
-			result = requests.get(url, timeout=20).json()
+			result = session.get(url, timeout=20).json()
 			if result.get('status') == 'success' and 'data' in result: result = result['data']
 		except: pass
 		return result
@@ -208,7 +209,7 @@ class AllDebridAPI:
 		try:
 			if self.token in ('empty_setting', ''): return None
 			url = self.base_url + url + '?agent=%s&apikey=%s' % (self.user_agent, self.token)
-			result = requests.post(url, data=data, timeout=20).json()
+			result = session.post(url, data=data, timeout=20).json()
 			if result.get('status') == 'success' and 'data' in result: result = result['data']
 		except: pass
 		return result
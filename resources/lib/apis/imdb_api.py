@@ -1,15 +1,16 @@
 # -*- coding: utf-8 -*-
 import re
 import json
-import requests
 from caches.base_cache import connect_database
 from caches.main_cache import cache_object
 from caches.settings_cache import get_setting
 from modules.dom_parser import parseDOM
-from modules.kodi_utils import sleep
+from modules.kodi_utils import make_session, sleep
 from modules.utils import remove_accents, replace_html_codes, normalize
 # from modules.kodi_utils import logger
 
+session = make_session('https://www.imdb.com/')
+
 def imdb_more_like_this(imdb_id):
 	url = 'https://www.imdb.com/title/%s' % imdb_id
 	string = 'imdb_more_like_this_%s' % imdb_id
@@ -74,7 +75,7 @@ def get_imdb(params):
 					if _id.replace('tt','').isnumeric(): yield (_id)
 				except: pass
 		try:
-			result = requests.get(url, timeout=20, headers=headers).text
+			result = session.get(url, timeout=20, headers=headers).text
 			result = result.split('<span>Storyline</span>')[0].split('<span>More like this</span>')[1]
 			items = str(result).split('poster-card__title--clickable" aria-label="')
 		except: items = []
@@ -92,7 +93,7 @@ def get_imdb(params):
 				except: pass
 		if action == 'imdb_trivia': _str = 'TRIVIA'
 		else: _str =  'BLUNDERS'
-		result = requests.get(url, timeout=20, headers=headers)
+		result = session.get(url, timeout=20, headers=headers)
 		result = remove_accents(result.text)
 		result = result.replace('\n', ' ')
 		items = parseDOM(result, 'div', attrs={'class': 'ipc-html-content-inner-div'})
@@ -108,7 +109,7 @@ def get_imdb(params):
 					yield content
 				except: pass
 		trivia_str = 'TRIVIA'
-		result = requests.get(url, timeout=20, headers=headers)
+		result = session.get(url, timeout=20, headers=headers)
 		result = remove_accents(result.text)
 		result = result.replace('\n', ' ')
 		items = parseDOM(result, 'div', attrs={'class': 'ipc-html-content-inner-div'})
@@ -141,7 +142,7 @@ def get_imdb(params):
 					yield review
 				except: pass
 		spoiler_str = 'CONTAINS SPOILERS'
-		result = requests.get(url, timeout=20, headers=headers)
+		result = session.get(url, timeout=20, headers=headers)
 		result = remove_accents(result.text)
 		result = result.replace('\n', ' ')
 		body = re.findall(r'{"node":{"id":(.*)"__typename":"ReviewEdge"', result)[0]
@@ -150,13 +151,13 @@ def get_imdb(params):
 	elif action == 'imdb_people_id':
 		try:
 			name = params['name']
-			result = requests.get(url, timeout=20)
+			result = session.get(url, timeout=20)
 			results = json.loads(re.sub(r'imdb\$(.+?)\(', '', result.text)[:-1])['d']
 			imdb_list = [i['id'] for i in results if i['id'].startswith('nm') and i['l'].lower() == name][0]
 		except: imdb_list = []
 		if not imdb_list:
 			try:
-				result = requests.get(params['url_backup'], timeout=20)
+				result = session.get(params['url_backup'], timeout=20)
 				result = remove_accents(result.text)
 				result = result.replace('\n', ' ')
 				result = parseDOM(result, 'div', attrs={'class': 'lister-item-image'})[0]
@@ -165,7 +166,7 @@ def get_imdb(params):
 	elif action == 'imdb_year_check':
 		try:
 			imdb_id = params.get('imdb_id')
-			result = requests.get(url, timeout=5)
+			result = session.get(url, timeout=5)
 			result = result.json()
 			result = result['d']
 			imdb_list = [str(i['y']) for i in result if i['id'] == imdb_id][0]
@@ -173,7 +174,7 @@ def get_imdb(params):
 	elif action == 'imdb_parentsguide':
 		imdb_list = []
 		imdb_append = imdb_list.append
-		result = requests.get(url, timeout=20, headers=headers)
+		result = session.get(url, timeout=20, headers=headers)
 		result = remove_accents(result.text)
 		result = result.replace('\n', ' ')
 		results = parseDOM(result, 'section', attrs={'class': 'ipc-page-section ipc-page-section--base'})
@@ -2,16 +2,17 @@
 import re
 import json
 import time
-import requests
 from threading import Thread
 from urllib.parse import urlencode
 from caches.main_cache import cache_object
 from caches.settings_cache import get_setting, set_setting
 from modules.utils import copy2clip, make_qrcode
 from modules.source_utils import supported_video_extensions, seas_ep_filter, extras
-from modules.kodi_utils import sleep, ok_dialog, progress_dialog, notification
+from modules.kodi_utils import make_session, sleep, ok_dialog, progress_dialog, notification
 # logger = kodi_utils.logger
 
+session = make_session('https://www.premiumize.me/api/')
+
 class PremiumizeAPI:
 	def __init__(self):
 		self.token = get_setting('fenlight.pm.token', 'empty_setting')
@@ -195,14 +196,14 @@ class PremiumizeAPI:
 	def _get(self, url, data={}):
 		if self.token in ('empty_setting', ''): return None
 		url = 'https://www.premiumize.me/api/' + url
-		response = requests.get(url, data=data, headers=self.headers(), timeout=20).text
+		response = session.get(url, data=data, headers=self.headers(), timeout=20).text
 		try: return json.loads(response)
 		except: return response
 
 	def _post(self, url, data={}):
 		if self.token in ('empty_setting', '') and not 'token' in url: return None
 		if not 'token' in url: url = 'https://www.premiumize.me/api/' + url
-		response = requests.post(url, data=data, headers=self.headers(), timeout=20).text
+		response = session.post(url, data=data, headers=self.headers(), timeout=20).text
 		try: return json.loads(response)
 		except: return response
 
@@ -1,13 +1,12 @@
 # -*- coding: utf-8 -*-
 import re
 import time
-import requests
 from threading import Thread
 from caches.main_cache import cache_object
 from caches.settings_cache import get_setting, set_setting
 from modules.utils import copy2clip, make_tinyurl, make_qrcode
 from modules.source_utils import supported_video_extensions, seas_ep_filter, extras
-from modules.kodi_utils import sleep, ok_dialog, progress_dialog, notification
+from modules.kodi_utils import make_session, sleep, ok_dialog, progress_dialog, notification
 # from modules.kodi_utils import logger
 
 class RealDebridAPI:
@@ -17,6 +16,7 @@ class RealDebridAPI:
 		url = {'true': 'app.real-debrid.com', 'false': 'api.real-debrid.com'}[get_setting('fenlight.rd.alternate_base_url', 'false')]
 		self.base_url = 'https://%s/rest/1.0/' % url
 		self.auth_url = 'https://%s/oauth/v2/' % url
+		self.session = make_session(self.base_url)
 		self.token = get_setting('fenlight.rd.token', 'empty_setting')
 		self.secret = get_setting('fenlight.rd.secret', 'empty_setting')
 		self.refresh = get_setting('fenlight.rd.refresh', 'empty_setting')
@@ -28,7 +28,7 @@ class RealDebridAPI:
 		self.secret = ''
 		self.client_ID = 'X245A4XAIBGVM'
 		url = self.auth_url + 'device/code?%s' % 'client_id=%s&new_credentials=yes' % self.client_ID
-		response = requests.get(url, timeout=20).json()
+		response = self.session.get(url, timeout=20).json()
 		user_code = response['user_code']
 		auth_url = response['direct_verification_url']
 		qr_code = make_qrcode(auth_url) or ''
@@ -46,7 +46,7 @@ class RealDebridAPI:
 		start, time_passed = time.time(), 0
 		while not progressDialog.iscanceled() and time_passed < expires_in and not self.secret:
 			sleep(1000 * sleep_interval)
-			try: response = requests.get(poll_url, timeout=20).json()
+			try: response = self.session.get(poll_url, timeout=20).json()
 			except: continue
 			if 'error' in response:
 				time_passed = time.time() - start
@@ -67,7 +67,7 @@ class RealDebridAPI:
 		if self.secret:
 			data = {'client_id': self.client_ID, 'client_secret': self.secret, 'code': device_code, 'grant_type': 'http://oauth.net/grant_type/device/1.0'}
 			url = '%stoken' % self.auth_url
-			response = requests.post(url, data=data, timeout=20).json()
+			response = self.session.post(url, data=data, timeout=20).json()
 			self.token = response['access_token']
 			self.refresh = response['refresh_token']
 			username = self.account_info()['username']
@@ -81,7 +81,7 @@ class RealDebridAPI:
 		try:
 			url = self.auth_url + 'token'
 			data = {'client_id': self.client_ID, 'client_secret': self.secret, 'code': self.refresh, 'grant_type': 'http://oauth.net/grant_type/device/1.0'}
-			response = requests.post(url, data=data).json()
+			response = self.session.post(url, data=data).json()
 			self.token = response['access_token']
 			self.refresh = response['refresh_token']
 			set_setting('rd.token', self.token)
@@ -186,13 +186,13 @@ class RealDebridAPI:
 	def delete_torrent(self, folder_id):
 		if self.token in ('empty_setting', ''): return None
 		url = 'torrents/delete/%s&auth_token=%s' % (folder_id, self.token)
-		response = requests.delete(self.base_url + url, timeout=20)
+		response = self.session.delete(self.base_url + url, timeout=20)
 		return response
 
 	def delete_download(self, download_id):
 		if self.token in ('empty_setting', ''): return None
 		url = 'downloads/delete/%s&auth_token=%s' % (download_id, self.token)
-		response = requests.delete(self.base_url + url, timeout=20)
+		response = self.session.delete(self.base_url + url, timeout=20)
 		return response
 
 	def resolve_magnet(self, magnet_url, info_hash, store_to_cloud, title, season, episode):
@@ -311,7 +311,7 @@ class RealDebridAPI:
 		if self.token in ('empty_setting', ''): return None
 		if '?' not in url: url += '?auth_token=%s' % self.token
 		else: url += '&auth_token=%s' % self.token
-		response = requests.get(url, timeout=20)
+		response = self.session.get(url, timeout=20)
 		if any(value in response.text for value in ('bad_token', 'Bad Request')):
 			if self.refresh_token(): response = self._get(original_url)
 			else: return None
@@ -324,7 +324,7 @@ class RealDebridAPI:
 		if self.token in ('empty_setting', ''): return None
 		if '?' not in url: url += '?auth_token=%s' % self.token
 		else: url += '&auth_token=%s' % self.token
-		response = requests.post(url, data=post_data, timeout=20)
+		response = self.session.post(url, data=post_data, timeout=20)
 		if any(value in response.text for value in ('bad_token', 'Bad Request')):
 			if self.refresh_token(): response = self._post(original_url, post_data)
 			else: return None
@@ -334,14 +334,14 @@ class RealDebridAPI:
 	def clear_cache(self, clear_hashes=True):
 		try:
 			from caches.debrid_cache import debrid_cache
-			from caches.base_cache import connect_database
+			from caches.base_cache import connect_database, decode_data
 			dbcon = connect_database('maincache_db')
 			user_cloud_success = False
 			# USER CLOUD
 			try:
 				try:
 					cache = dbcon.execute("""SELECT data FROM maincache WHERE id LIKE ?""", ('rd_user_cloud_info_%',)).fetchall()
-					user_cloud_info_caches = [eval(i[0])['id'] for i in cache]
+					user_cloud_info_caches = [decode_data(i[0])['id'] for i in cache]
 				except:
 					user_cloud_success = True
 				if not user_cloud_success:
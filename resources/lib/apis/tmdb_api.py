@@ -3,7 +3,7 @@ import datetime
 from caches.meta_cache import cache_function
 from caches.lists_cache import lists_cache_object
 from modules.settings import get_meta_filter, tmdb_api_key
-from modules.kodi_utils import make_session, remove_keys
+from modules.kodi_utils import make_session, remove_keys, request_limiters
 # from modules.kodi_utils import logger
 
 session = make_session('https://api.themoviedb.org/3')
@@ -16,20 +16,31 @@ def no_api_key():
 	notification('Please set a valid TMDb API Key')
 	return []
 
+def movie_details_url(tmdb_id, api_key):
+	return 'https://api.themoviedb.org/3/movie/%s?api_key=%s&language=en&append_to_response=external_ids,videos,credits,release_dates,alternative_titles,translations,' \
+	'images,keywords&include_image_language=en,null' % (tmdb_id, api_key)
+
+def tvshow_details_url(tmdb_id, api_key):
+	return 'https://api.themoviedb.org/3/tv/%s?api_key=%s&language=en&append_to_response=external_ids,videos,credits,content_ratings,alternative_titles,translations,' \
+	'images,keywords&include_image_language=en,null' % (tmdb_id, api_key)
+
+def season_episodes_details_url(tmdb_id, season_no, api_key):
+	return 'https://api.themoviedb.org/3/tv/%s/season/%s?api_key=%s&language=en&append_to_response=credits' % (tmdb_id, season_no, api_key)
+
 def movie_details(tmdb_id, api_key):
-	try:
-		url = 'https://api.themoviedb.org/3/movie/%s?api_key=%s&language=en&append_to_response=external_ids,videos,credits,release_dates,alternative_titles,translations,' \
-		'images,keywords&include_image_language=en,null' % (tmdb_id, api_key)
-		return get_tmdb(url).json()
+	try: return get_tmdb(movie_details_url(tmdb_id, api_key)).json()
 	except: return None
 
 def tvshow_details(tmdb_id, api_key):
-	try:
-		url = 'https://api.themoviedb.org/3/tv/%s?api_key=%s&language=en&append_to_response=external_ids,videos,credits,content_ratings,alternative_titles,translations,' \
-		'images,keywords&include_image_language=en,null' % (tmdb_id, api_key)
-		return get_tmdb(url).json()
+	try: return get_tmdb(tvshow_details_url(tmdb_id, api_key)).json()
 	except: return None
 
+def movie_details_many(tmdb_ids, api_key):
+	return get_tmdb_many([movie_details_url(i, api_key) for i in tmdb_ids])
+
+def tvshow_details_many(tmdb_ids, api_key):
+	return get_tmdb_many([tvshow_details_url(i, api_key) for i in tmdb_ids])
+
 def episode_groups_data(tmdb_id):
 	api_key = tmdb_api_key()
 	if api_key in (None, 'empty_setting', ''): return no_api_key()
@@ -544,11 +555,14 @@ def tmdb_people_info(query, page_no=1):
 def season_episodes_details(tmdb_id, season_no):
 	api_key = tmdb_api_key()
 	if api_key in (None, 'empty_setting', ''): return no_api_key()
-	try:
-		url = 'https://api.themoviedb.org/3/tv/%s/season/%s?api_key=%s&language=en&append_to_response=credits' % (tmdb_id, season_no, api_key)
-		return get_tmdb(url).json()
+	try: return get_tmdb(season_episodes_details_url(tmdb_id, season_no, api_key)).json()
 	except: return None
 
+def season_episodes_details_many(tmdb_id, seasons):
+	api_key = tmdb_api_key()
+	if api_key in (None, 'empty_setting', ''): return [None for i in seasons]
+	return get_tmdb_many([season_episodes_details_url(tmdb_id, i, api_key) for i in seasons])
+
 def get_dates(days, reverse=True):
 	current_date = get_current_date(return_str=False)
 	if reverse: new_date = (current_date - datetime.timedelta(days=days)).strftime('%Y-%m-%d')
@@ -596,3 +610,10 @@ def get_tmdb(url):
 	try: response = session.get(url, timeout=20.0)
 	except: response = None
 	return response
+
+def get_tmdb_many(urls):
+	# One event loop for the whole batch. None marks a url to fetch again through get_tmdb.
+	try:
+		from modules.async_http import fetch_json_many
+		return fetch_json_many(urls, concurrency=20, timeout=20.0, limiter=request_limiters['api.themoviedb.org'][0])
+	except: return [None for i in urls]
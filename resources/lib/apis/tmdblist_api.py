@@ -14,9 +14,8 @@ class TMDbListAPI:
 								'gzNTQ0MTZhIiwic2NvcGVzIjpbImFwaV9yZWFkIl0sInZlcnNpb24iOjF9.8uevSMakSrdZb1t0ze4OIxq6PoL4N6DZN4VVkKUCayg'
 	
 	def auth(self):
-		import requests
 		headers = {'accept': 'application/json', 'content-type': 'application/json', 'Authorization': 'Bearer %s' % self.read_access_token}
-		data = requests.post('%s/auth/request_token' % self.base_url, headers=headers, timeout=20).json()
+		data = session.post('%s/auth/request_token' % self.base_url, headers=headers, timeout=20).json()
 		if not 'success' in data: return notification('Failed to Auth Account')
 		request_token = data['request_token']
 		token_url = 'https://www.themoviedb.org/auth/access?request_token=%s' % request_token
@@ -30,7 +29,7 @@ class TMDbListAPI:
 		while not progressDialog.iscanceled() and count >= 0 and success == None:
 			try:
 				count -= 1
-				response = requests.post('%s/auth/access_token' % self.base_url, json={'request_token': request_token}, headers=headers, timeout=20).json()
+				response = session.post('%s/auth/access_token' % self.base_url, json={'request_token': request_token}, headers=headers, timeout=20).json()
 				if response.get('success') and response.get('access_token'): success = True
 				progressDialog.update('Please Scan the QR Code%s[CR]Confirm Access to your TMDb Account' % p_dialog_insert, count)
 				sleep(2500)
@@ -45,9 +44,8 @@ class TMDbListAPI:
 		notification(notice)
 	
 	def revoke(self):
-		import requests
 		headers = {'accept': 'application/json', 'content-type': 'application/json', 'Authorization': 'Bearer %s' % self.read_access_token}
-		data = requests.delete('%s/auth/access_token' % self.base_url, json={'access_token': self.read_access_token}, headers=headers, timeout=20).json()
+		data = session.delete('%s/auth/access_token' % self.base_url, json={'access_token': self.read_access_token}, headers=headers, timeout=20).json()
 		if not 'success' in data: notice = 'Failed to Revoke Account Auth'
 		else:
 			notice = 'Success Auth Revoke'
@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 import json
 import time
-import requests
 from urllib.parse import unquote, quote_plus
 from caches import trakt_cache
 from caches.settings_cache import get_setting, set_setting
@@ -13,6 +12,8 @@ from modules.utils import sort_list, sort_for_article, get_datetime, timedelta,
 							make_thread_list, jsondate_to_datetime as js2date
 # logger = kodi_utils.logger
 
+session = kodi_utils.make_session('https://api.trakt.tv/')
+
 def no_client_key():
 	kodi_utils.notification('Please set a valid Trakt Client ID Key')
 	return None
@@ -41,16 +42,16 @@ def call_trakt(path, params={}, data=None, is_delete=False, with_auth=True, meth
 		try:
 			if method:
 				if method == 'post':
-					resp = requests.post(API_ENDPOINT % path, headers=headers, timeout=10)
+					resp = session.post(API_ENDPOINT % path, headers=headers, timeout=10)
 				elif method == 'delete':
-					resp = requests.delete(API_ENDPOINT % path, headers=headers, timeout=10)
+					resp = session.delete(API_ENDPOINT % path, headers=headers, timeout=10)
 				elif method == 'sort_by_headers':
-					resp = requests.get(API_ENDPOINT % path, params=params, headers=headers, timeout=10)
+					resp = session.get(API_ENDPOINT % path, params=params, headers=headers, timeout=10)
 			elif data is not None:
 				assert not params
-				resp = requests.post(API_ENDPOINT % path, json=data, headers=headers, timeout=10)
-			elif is_delete: resp = requests.delete(API_ENDPOINT % path, headers=headers, timeout=10)
-			else: resp = requests.get(API_ENDPOINT % path, params=params, headers=headers, timeout=10)
+				resp = session.post(API_ENDPOINT % path, json=data, headers=headers, timeout=10)
+			elif is_delete: resp = session.delete(API_ENDPOINT % path, headers=headers, timeout=10)
+			else: resp = session.get(API_ENDPOINT % path, params=params, headers=headers, timeout=10)
 			resp.raise_for_status()
 		except Exception as e: kodi_utils.logger('Trakt Error', str(e))
 		return resp
@@ -67,11 +68,6 @@ def call_trakt(path, params={}, data=None, is_delete=False, with_auth=True, meth
 			if settings.trakt_user_active(): trakt_refresh_token()
 			else: return None
 		else: return None
-	elif status_code == 429:
-		headers = response.headers
-		if 'Retry-After' in headers:
-			kodi_utils.sleep(1000 * headers['Retry-After'])
-			response = send_query()
 	response.encoding = 'utf-8'
 	result = response.json() if 'json' in response.headers.get('Content-Type', '') else response.text
 	headers = response.headers
@@ -114,7 +110,7 @@ def trakt_get_device_token(device_codes):
 			time_passed = 0
 			while not progressDialog.iscanceled() and time_passed < expires_in:
 				kodi_utils.sleep(max(sleep_interval, 1)*1000)
-				response = requests.post(API_ENDPOINT % 'oauth/device/token', data=json.dumps(data), headers=headers, timeout=20)
+				response = session.post(API_ENDPOINT % 'oauth/device/token', data=json.dumps(data), headers=headers, timeout=20)
 				status_code = response.status_code
 				if status_code == 200:
 					result = response.json()
@@ -618,9 +614,11 @@ def trakt_indicators_movies():
 
 def trakt_indicators_tv():
 	def _process(item):
-		reset_at = item.get('reset_at', None)
-		if reset_at: reset_at = js2date(reset_at, '%Y-%m-%dT%H:%M:%S.%fZ')
 		show = item['show']
+		reset_at = item.get('reset_at', None)
+		if reset_at:
+			resets[str(show['ids']['trakt'])] = reset_at
+			reset_at = js2date(reset_at, '%Y-%m-%dT%H:%M:%S.%fZ')
 		seasons = item['seasons']
 		title = show['title']
 		tmdb_id = get_trakt_tvshow_id(show['ids'])
@@ -631,13 +629,71 @@ def trakt_indicators_tv():
 				last_watched_at = e['last_watched_at']
 				if reset_at and reset_at > js2date(last_watched_at, '%Y-%m-%dT%H:%M:%S.%fZ'): continue
 				insert_append(('episode', tmdb_id, season_no, e['number'], last_watched_at, title))
-	insert_list = []
+	insert_list, resets = [], {}
 	insert_append = insert_list.append
 	params = {'path': 'users/me/watched/shows?extended=full%s', 'with_auth': True, 'pagination': False}
 	result = get_trakt(params)
 	threads = list(make_thread_list(_process, result))
 	[i.join() for i in threads]
 	trakt_cache.trakt_watched_cache.set_bulk_tvshow_watched(insert_list)
+	return resets
+
+def trakt_history_tv(start_at):
+	def _process(items):
+		show = items[0]['show']
+		tmdb_id = get_trakt_tvshow_id(show['ids'])
+		if not tmdb_id: return
+		for item in items: insert_append(('episode', tmdb_id, item['episode']['season'], item['episode']['number'], item['watched_at'], show['title']))
+	shows, page_no, page_count = {}, 1, 1
+	while page_no <= page_count:
+		result, page_count = call_trakt('sync/history/episodes', params={'start_at': start_at, 'limit': 1000}, pagination=True, page_no=page_no)
+		for item in result: shows.setdefault(item['show']['ids']['trakt'], []).append(item)
+		page_count, page_no = int(page_count), page_no + 1
+	insert_list = []
+	insert_append = insert_list.append
+	threads = list(make_thread_list(_process, list(shows.values())))
+	[i.join() for i in threads]
+	trakt_cache.trakt_watched_cache.set_tvshow_watched(insert_list)
+
+def trakt_watched_count_tv():
+	return call_trakt('users/me/stats')['episodes']['watched']
+
+def trakt_resets_tv(synced_resets):
+	# Applies the progress resets made since the last sync and returns each show's reset time, keyed by Trakt id.
+	resets, reset_list = {}, []
+	for item in call_trakt('sync/watched/shows', params={'extended': 'noseasons'}):
+		reset_at = item.get('reset_at', None)
+		if not reset_at: continue
+		trakt_id = str(item['show']['ids']['trakt'])
+		resets[trakt_id] = reset_at
+		if reset_at == synced_resets.get(trakt_id): continue
+		tmdb_id = get_trakt_tvshow_id(item['show']['ids'])
+		if tmdb_id: reset_list.append((tmdb_id, reset_at))
+	if reset_list: trakt_cache.trakt_watched_cache.reset_tvshow_watched(reset_list)
+	return resets
+
+def trakt_sync_watched_tv(latest_watched_at):
+	# Only plays added since the last sync are downloaded. Trakt's watched count is then checked against the local table, which catches removals,
+	# backdated plays and anything else the history window misses, and a full download is done whenever they disagree or a week has passed.
+	# A progress reset leaves the count unchanged, so each show's reset time is compared with the one recorded at the last sync, and the
+	# episodes played before a new reset are removed.
+	string = 'trakt_watched_sync'
+	sync_info = trakt_cache.trakt_cache.get(string)
+	try:
+		if not sync_info or time.time() >= sync_info['reconcile_at']: raise Exception()
+		trakt_history_tv(sync_info['start_at'])
+		watched_count = trakt_watched_count_tv()
+		if watched_count - trakt_cache.trakt_watched_cache.tvshow_watched_count() != sync_info['offset']: raise Exception()
+		resets = trakt_resets_tv(sync_info['resets'])
+		reconcile_at = sync_info['reconcile_at']
+	except:
+		resets = trakt_indicators_tv()
+		try: watched_count = trakt_watched_count_tv()
+		except: return trakt_cache.trakt_cache.delete(string)
+		reconcile_at = int(time.time()) + (7*24*3600)
+	# The offset covers shows with no TMDb id and plays hidden by a progress reset, which Trakt counts but the local table never holds.
+	offset = watched_count - trakt_cache.trakt_watched_cache.tvshow_watched_count()
+	trakt_cache.trakt_cache.set(string, {'start_at': latest_watched_at, 'offset': offset, 'reconcile_at': reconcile_at, 'resets': resets})
 
 def trakt_playback_progress():
 	params = {'path': 'sync/playback%s', 'with_auth': True, 'pagination': False}
@@ -804,7 +860,7 @@ def trakt_sync_activities(force_update=False):
 		trakt_indicators_movies()
 	if _compare(latest_episodes['watched_at'], cached_episodes.get('watched_at', fallback_date)):
 		clear_properties('episode')
-		trakt_indicators_tv()
+		trakt_sync_watched_tv(latest_episodes['watched_at'])
 		# clear_tvshow_watched_cache = True
 	if _compare(latest_movies['paused_at'], cached_movies.get('paused_at', fallback_date)): refresh_movies_progress = True
 	if _compare(latest_episodes['paused_at'], cached_episodes.get('paused_at', fallback_date)): refresh_shows_progress = True
@@ -1,6 +1,12 @@
 # -*- coding: utf-8 -*-
+import sys
 import time
+import marshal
+import random
 from os import path
+from threading import local, Thread, Lock, Event
+from ast import literal_eval
+from base64 import b64encode, b64decode
 import sqlite3 as database
 from modules import kodi_utils
 logger = kodi_utils.logger
@@ -15,29 +21,41 @@ def table_creators():
 'CREATE TABLE IF NOT EXISTS progress \
 (db_type text not null, media_id text not null, season integer, episode integer, resume_point text, curr_time text, \
 last_played text, resume_id integer, title text, unique (db_type, media_id, season, episode))',
-'CREATE TABLE IF NOT EXISTS watched_status (db_type text not null, media_id text not null, status text, unique (db_type, media_id))'),
+'CREATE TABLE IF NOT EXISTS watched_status (db_type text not null, media_id text not null, status text, unique (db_type, media_id))',
+'CREATE TABLE IF NOT EXISTS watched_shows (media_id text not null unique, title text, total_played integer, last_played text, season integer, episode integer, \
+furthest_season integer, furthest_episode integer, furthest_played text)',
+'CREATE INDEX IF NOT EXISTS watched_last_played ON watched (db_type, last_played)'),
 'favorites_db': (
 'CREATE TABLE IF NOT EXISTS favourites (db_type text not null, tmdb_id text not null, title text not null, unique (db_type, tmdb_id))',),
 'settings_db': (
 'CREATE TABLE IF NOT EXISTS settings (setting_id text not null unique, setting_type text, setting_default text, setting_value text)',),
 'trakt_db': (
 'CREATE TABLE IF NOT EXISTS trakt_data (id text unique, data text)',
+'CREATE TABLE IF NOT EXISTS trakt_stale (id text unique, data text)',
+'CREATE TABLE IF NOT EXISTS validators (id text unique, etag text, last_modified text)',
 'CREATE TABLE IF NOT EXISTS watched \
 (db_type text not null, media_id text not null, season integer, episode integer, last_played text, title text, unique (db_type, media_id, season, episode))',
 'CREATE TABLE IF NOT EXISTS progress \
 (db_type text not null, media_id text not null, season integer, episode integer, resume_point text, curr_time text, \
 last_played text, resume_id integer, title text, unique (db_type, media_id, season, episode))',
-'CREATE TABLE IF NOT EXISTS watched_status (db_type text not null, media_id text not null, status text, unique (db_type, media_id))'),
+'CREATE TABLE IF NOT EXISTS watched_status (db_type text not null, media_id text not null, status text, unique (db_type, media_id))',
+'CREATE TABLE IF NOT EXISTS watched_shows (media_id text not null unique, title text, total_played integer, last_played text, season integer, episode integer, \
+furthest_season integer, furthest_episode integer, furthest_played text)',
+'CREATE INDEX IF NOT EXISTS watched_last_played ON watched (db_type, last_played)'),
 'maincache_db': (
-'CREATE TABLE IF NOT EXISTS maincache (id text unique, data text, expires integer)',),
+'CREATE TABLE IF NOT EXISTS maincache (id text unique, data text, expires integer)',
+'CREATE TABLE IF NOT EXISTS validators (id text unique, etag text, last_modified text)'),
 'metacache_db': (
 'CREATE TABLE IF NOT EXISTS metadata (db_type text not null, tmdb_id text not null, imdb_id text, tvdb_id text, meta text, expires integer, unique (db_type, tmdb_id))',
 'CREATE TABLE IF NOT EXISTS season_metadata (tmdb_id text not null unique, meta text, expires integer)',
-'CREATE TABLE IF NOT EXISTS function_cache (string_id text not null unique, data text, expires integer)'),
+'CREATE TABLE IF NOT EXISTS function_cache (string_id text not null unique, data text, expires integer)',
+'CREATE TABLE IF NOT EXISTS validators (id text unique, etag text, last_modified text)'),
 'debridcache_db': (
-'CREATE TABLE IF NOT EXISTS debrid_data (hash text not null, debrid text not null, cached text, expires integer, unique (hash, debrid))',),
+'CREATE TABLE IF NOT EXISTS debrid_data (hash text not null, debrid text not null, cached text, expires integer, unique (hash, debrid))',
+'CREATE INDEX IF NOT EXISTS debrid_data_expires ON debrid_data (expires)'),
 'lists_db': (
-'CREATE TABLE IF NOT EXISTS lists (id text unique, data text, expires integer)',),
+'CREATE TABLE IF NOT EXISTS lists (id text unique, data text, expires integer)',
+'CREATE TABLE IF NOT EXISTS validators (id text unique, etag text, last_modified text)'),
 'external_db': (
 'CREATE TABLE IF NOT EXISTS results_data (provider text not null, db_type text not null, tmdb_id text not null, title text, year integer, season text, episode text, results text, \
 expires integer, unique (provider, db_type, tmdb_id, title, year, season, episode))',),
@@ -69,6 +87,7 @@ def make_database(database_name):
 	dbcon = database.connect(database_locations(database_name))
 	all_commands = table_creators()[database_name]
 	for command in all_commands: dbcon.execute(command)
+	if database_name in ('watched_db', 'trakt_db') and not dbcon.execute('SELECT 1 FROM watched_shows LIMIT 1').fetchone(): update_watched_shows(dbcon)
 	dbcon.close()
 
 def make_databases():
@@ -77,11 +96,223 @@ def make_databases():
 	all_locations = locations()
 	for database_name in all_locations: make_database(database_name)
 
+connections_generation = 0
+wal_companions = ('-wal', '-shm')
+
+class RetryConnection(database.Connection):
+	# The timeout busy handler covers normal writer contention. This covers the SQLITE_BUSY cases it does not, such as a
+	# checkpoint or WAL recovery in progress, with a jittered backoff before giving up.
+	retries = 6
+
+	def execute(self, *args):
+		for count in range(self.retries):
+			try: return database.Connection.execute(self, *args)
+			except database.OperationalError as e:
+				if count == self.retries - 1 or not busy_error(e): raise
+				time.sleep(busy_backoff(count))
+
+	def executemany(self, *args):
+		for count in range(self.retries):
+			try: return database.Connection.executemany(self, *args)
+			except database.OperationalError as e:
+				if count == self.retries - 1 or not busy_error(e): raise
+				time.sleep(busy_backoff(count))
+
+def busy_error(error):
+	error = str(error)
+	return 'locked' in error or 'busy' in error
+
+def busy_backoff(count):
+	return min(0.05 * (2 ** count), 1.0) * random.uniform(0.5, 1.5)
+
+def wal_mode():
+	# Read straight from the window property. get_setting() would need a settings_db connection to be made first.
+	return kodi_utils.get_property('fenlight.database_wal_mode') != 'false'
+
+class DatabaseConnections(local):
+	# One open connection per database file per thread, with PRAGMAs applied once when the connection is made.
+	# Bumping connections_generation makes every thread drop and reopen its connections on their next use.
+	def __init__(self):
+		self.connections, self.generation = {}, connections_generation
+
+	def get(self, database_name):
+		if self.generation != connections_generation: self.close_all()
+		try: return self.connections[database_name]
+		except KeyError: pass
+		dbcon = database.connect(database_locations(database_name), timeout=20, isolation_level=None, check_same_thread=False, factory=RetryConnection)
+		if wal_mode():
+			dbcon.execute('PRAGMA journal_mode = WAL')
+			dbcon.execute('PRAGMA synchronous = NORMAL')
+		else:
+			dbcon.execute('PRAGMA journal_mode = OFF')
+			dbcon.execute('PRAGMA synchronous = OFF')
+		self.connections[database_name] = dbcon
+		return dbcon
+
+	def close_all(self):
+		for dbcon in self.connections.values():
+			try: dbcon.close()
+			except: pass
+		self.connections, self.generation = {}, connections_generation
+
+database_connections = DatabaseConnections()
+
 def connect_database(database_name):
-	dbcon = database.connect(database_locations(database_name), timeout=20, isolation_level=None, check_same_thread=False)
-	dbcon.execute('PRAGMA synchronous = OFF')
-	dbcon.execute('PRAGMA journal_mode = OFF')
-	return dbcon
+	return database_connections.get(database_name)
+
+def close_connections():
+	global connections_generation
+	connections_generation += 1
+	database_connections.close_all()
+
+codec_header = b'FLM' + bytes((marshal.version,))
+property_header = b64encode(b'FLM').decode('ascii')
+
+def encode_data(data):
+	# Cached rows are stored as marshal BLOBs behind a versioned header. Anything marshal cannot handle falls back to a repr TEXT row.
+	try: return codec_header + marshal.dumps(data, marshal.version)
+	except ValueError: return repr(data)
+
+def decode_data(data):
+	# BLOB rows with an unknown header (older/newer codec) are treated as a cache miss. TEXT rows are legacy repr rows and are
+	# parsed safely, then rewritten in the new format the next time the entry is set.
+	if isinstance(data, bytes):
+		if data[:4] != codec_header: return None
+		return marshal.loads(data[4:])
+	return literal_eval(data)
+
+def encode_property(data):
+	# Window properties only hold strings, so the BLOB is base64 wrapped. A repr fallback is stored as is.
+	data = encode_data(data)
+	if isinstance(data, str): return data
+	return b64encode(data).decode('ascii')
+
+def decode_property(data):
+	if data.startswith(property_header): return decode_data(b64decode(data))
+	return literal_eval(data)
+
+def checkpoint_databases():
+	# Fold each WAL file back into its database and truncate it, so WAL files do not grow between VACUUMs.
+	if not wal_mode(): return
+	for database_name in locations():
+		try: connect_database(database_name).execute('PRAGMA wal_checkpoint(TRUNCATE)')
+		except: pass
+
+def get_validators(dbcon, string):
+	validators = dbcon.execute('SELECT etag, last_modified FROM validators WHERE id = ?', (string,)).fetchone()
+	if not validators: return None
+	return dict((k, v) for k, v in zip(('etag', 'last_modified'), validators) if v)
+
+def set_validators(dbcon, string, validators):
+	if validators: dbcon.execute('INSERT OR REPLACE INTO validators VALUES (?, ?, ?)', (string, validators.get('etag'), validators.get('last_modified')))
+	else: dbcon.execute('DELETE FROM validators WHERE id = ?', (string,))
+
+def conditional_call(function, args, json, validators):
+	# Calls function for fresh data, revalidating with the stored validators on its first GET.
+	# Returns (result, validators, not_modified). When not_modified is True the result is meaningless and the stored data is still current.
+	context = kodi_utils.conditional_requests.push(validators)
+	try:
+		try:
+			result = function(*args)
+			if json: result = result.json()
+		except:
+			if not context['not_modified']: raise
+			result = None
+		return result, context['response_validators'], context['not_modified']
+	finally: kodi_utils.conditional_requests.pop()
+
+class SingleFlight:
+	# Concurrent callers missing the same key share one fetch. The first caller runs it, the others wait for its result or exception.
+	# Dicts are handed to waiters as shallow copies, as callers add keys to what they are given.
+	def __init__(self):
+		self.calls, self.lock = {}, Lock()
+		self.fetches, self.saved = 0, 0
+
+	def do(self, key, function, *args):
+		with self.lock:
+			call = self.calls.get(key)
+			if call is None:
+				call = self.calls[key] = {'done': Event(), 'result': None, 'error': None}
+				self.fetches += 1
+				leader = True
+			else:
+				self.saved += 1
+				leader = False
+		if not leader:
+			call['done'].wait()
+			if call['error'] is not None: raise call['error']
+			if isinstance(call['result'], dict): return dict(call['result'])
+			return call['result']
+		try: call['result'] = function(*args)
+		except Exception as e:
+			call['error'] = e
+			raise
+		finally:
+			with self.lock: del self.calls[key]
+			call['done'].set()
+		return call['result']
+
+	def stats(self):
+		with self.lock: return {'fetches': self.fetches, 'saved': self.saved, 'in_flight': len(self.calls)}
+
+single_flight = SingleFlight()
+
+def fetch_object(cache, function, string, args, json, expiration, expired, validators):
+	return single_flight.do((cache.dbfile, string), _fetch_object, cache, function, string, args, json, expiration, expired, validators)
+
+def _fetch_object(cache, function, string, args, json, expiration, expired, validators):
+	result, validators, not_modified = conditional_call(function, args, json, validators)
+	if not_modified:
+		cache.refresh(string, expiration)
+		return expired
+	cache.set(string, result, expiration=expiration, validators=validators)
+	return result
+
+def stale_while_revalidate():
+	# Only widget directory listings are served stale, so browsing inside the addon and background jobs always see fresh data.
+	try:
+		if int(sys.argv[1]) < 0 or not kodi_utils.external(): return False
+	except: return False
+	from modules.settings import widget_stale_while_revalidate
+	return widget_stale_while_revalidate()
+
+def revalidate(string, fetch, stale, timeout=40):
+	# Returns the stale data at once and fetches fresh data in a thread, reloading widgets only if it changed.
+	# The property holds the start time, and is ignored after timeout (twice the request timeout), in case the invoker was
+	# stopped before the thread could clear it.
+	prop = 'fenlight.revalidating.%s' % string
+	try: started = float(kodi_utils.get_property(prop))
+	except: started = 0
+	if 0 <= time.time() - started < timeout: return stale
+	kodi_utils.set_property(prop, str(time.time()))
+	def _revalidate():
+		try:
+			if fetch() != stale: kodi_utils.kodi_refresh()
+		except: pass
+		finally: kodi_utils.clear_property(prop)
+	Thread(target=_revalidate).start()
+	return stale
+
+def update_watched_shows(dbcon, media_ids=None):
+	# watched_shows holds one row per show, so show and next episode lists never have to group the whole watched table.
+	# Rebuilds the rows of the given shows from watched, or of every show when media_ids is None.
+	if media_ids is not None:
+		media_ids = list(set(str(i) for i in media_ids))
+		if not media_ids: return
+		if len(media_ids) > 500: media_ids = None
+	if media_ids is None: where, args = '', ()
+	else: where, args = ' AND media_id IN (%s)' % ', '.join('?' for _ in media_ids), tuple(media_ids)
+	dbcon.execute('BEGIN IMMEDIATE')
+	try:
+		dbcon.execute('DELETE FROM watched_shows WHERE 1 = 1%s' % where, args)
+		dbcon.execute('INSERT INTO watched_shows (media_id, title, total_played, last_played, season, episode) \
+						SELECT media_id, title, COUNT(*), MAX(last_played), season, episode FROM watched WHERE db_type = ?%s GROUP BY media_id' % where, ('episode',) + args)
+		dbcon.execute('UPDATE watched_shows SET (furthest_season, furthest_episode, furthest_played) = (SELECT season, episode, last_played FROM watched \
+						WHERE db_type = ? AND media_id = watched_shows.media_id ORDER BY season DESC, episode DESC LIMIT 1) WHERE 1 = 1%s' % where, ('episode',) + args)
+		dbcon.execute('COMMIT')
+	except:
+		dbcon.execute('ROLLBACK')
+		raise
 
 def get_timestamp(offset=0):
 	# Offset is in HOURS multiply by 3600 to get seconds
@@ -94,7 +325,7 @@ def remove_old_databases():
 	try:
 		files = kodi_utils.list_dirs(databases_path)[1]
 		for item in files:
-			if not item in current_dbs:
+			if not item in current_dbs and not item.endswith(wal_companions):
 				try: kodi_utils.delete_file(databases_path + item)
 				except: pass
 	except: pass
@@ -128,7 +359,10 @@ def check_databases_integrity():
 				try: dbcon.close()
 				except: pass
 				kodi_utils.delete_file(database_location)
+				for item in wal_companions:
+					if kodi_utils.path_exists(database_location + item): kodi_utils.delete_file(database_location + item)
 	command_base = 'SELECT * FROM %s LIMIT 1'
+	close_connections()
 	database_errors = []
 	integ_check = integrity_check.items()
 	for database_name, tables in integ_check: _process(database_name, tables)
@@ -317,6 +551,8 @@ def change_column_schema():
 	#     conn.close()
 
 class BaseCache(object):
+	use_validators, stale_window = False, 0
+
 	def __init__(self, dbfile, table):
 		self.table = table
 		self.dbfile = dbfile
@@ -329,22 +565,42 @@ class BaseCache(object):
 			cache_data = dbcon.execute('SELECT expires, data FROM %s WHERE id = ?' % self.table, (string,)).fetchone()
 			if cache_data:
 				if cache_data[0] > current_time:
-					result = eval(cache_data[1])
-				else: self.delete(string)
+					result = decode_data(cache_data[1])
+				elif cache_data[0] > get_timestamp(-self.stale_window): pass
+				elif not self.use_validators or not get_validators(dbcon, string): self.delete(string)
 		except: pass
 		return result
 
-	def set(self, string, data, expiration=720):
+	def set(self, string, data, expiration=720, validators=None):
 		try:
 			dbcon = connect_database(self.dbfile)
 			expires = get_timestamp(expiration)
-			dbcon.execute('INSERT OR REPLACE INTO %s(id, data, expires) VALUES (?, ?, ?)' % self.table, (string, repr(data), int(expires)))
+			dbcon.execute('INSERT OR REPLACE INTO %s(id, data, expires) VALUES (?, ?, ?)' % self.table, (string, encode_data(data), int(expires)))
+			if self.use_validators and validators is not None: set_validators(dbcon, string, validators)
 		except: return None
 
+	def get_expired(self, string):
+		# Data and validators of an expired entry kept for revalidation or stale serving, or (None, None).
+		try:
+			dbcon = connect_database(self.dbfile)
+			validators = get_validators(dbcon, string) if self.use_validators else None
+			if not validators and not self.stale_window: return None, None
+			cache_data = dbcon.execute('SELECT data FROM %s WHERE id = ?' % self.table, (string,)).fetchone()
+			if cache_data: return decode_data(cache_data[0]), validators
+		except: pass
+		return None, None
+
+	def refresh(self, string, expiration=720):
+		try:
+			dbcon = connect_database(self.dbfile)
+			dbcon.execute('UPDATE %s SET expires = ? WHERE id = ?' % self.table, (int(get_timestamp(expiration)), string))
+		except: pass
+
 	def delete(self, string):
 		try:
 			dbcon = connect_database(self.dbfile)
 			dbcon.execute('DELETE FROM %s WHERE id = ?' % self.table, (string,))
+			if self.use_validators: dbcon.execute('DELETE FROM validators WHERE id = ?', (string,))
 		except: pass
 
 	def delete_like(self, string):
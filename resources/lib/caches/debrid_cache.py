@@ -4,15 +4,19 @@ from caches.base_cache import connect_database, get_timestamp
 
 class DebridCache:
 	def get_many(self, hash_list):
+		# Returns {debrid: {hash: cached}} for the unexpired stored hashes, cached being the stored 'True'/'False' string.
+		# Expiry is per row, expired rows are skipped here and left for remove_expired.
 		result = None
 		try:
 			dbcon = connect_database('debridcache_db')
 			current_time = get_timestamp()
-			cache_data = dbcon.execute('SELECT * FROM debrid_data WHERE hash in (%s)' % (', '.join('?' for _ in hash_list)), hash_list).fetchall()
-			dbcon.close()
+			cache_data = []
+			for chunk in [hash_list[i:i + 500] for i in range(0, len(hash_list), 500)]:
+				cache_data.extend(dbcon.execute('SELECT hash, debrid, cached FROM debrid_data WHERE hash in (%s) AND expires > ?' \
+												% (', '.join('?' for _ in chunk)), chunk + [current_time]).fetchall())
 			if cache_data:
-				if cache_data[0][3] > current_time: result = cache_data
-				else: self.remove_many(cache_data)
+				result = {}
+				for _hash, debrid, cached in cache_data: result.setdefault(debrid, {})[_hash] = cached
 		except: pass
 		return result
 
@@ -21,24 +25,20 @@ class DebridCache:
 			dbcon = connect_database('debridcache_db')
 			expires = get_timestamp(expires)
 			insert_list = [(i[0], debrid, i[1], expires) for i in hash_list]
-			dbcon.executemany('INSERT INTO debrid_data VALUES (?, ?, ?, ?)', insert_list)
-			dbcon.close()
+			dbcon.executemany('INSERT OR REPLACE INTO debrid_data VALUES (?, ?, ?, ?)', insert_list)
 		except: pass
 
-	def remove_many(self, old_cached_data):
+	def remove_expired(self):
 		try:
 			dbcon = connect_database('debridcache_db')
-			old_cached_data = [(str(i[0]),) for i in old_cached_data]
-			dbcon.executemany('DELETE FROM debrid_data WHERE hash=?', old_cached_data)
-			dbcon.close()
-		except: pass
+			return dbcon.execute('DELETE FROM debrid_data WHERE expires <= ?', (get_timestamp(),)).rowcount
+		except: return 0
 
 	def clear_debrid_results(self, debrid):
 		try:
 			dbcon = connect_database('debridcache_db')
 			dbcon.execute('DELETE FROM debrid_data WHERE debrid=?', (debrid,))
 			dbcon.execute('VACUUM')
-			dbcon.close()
 			return True
 		except: return False
 	
@@ -47,16 +47,14 @@ class DebridCache:
 			dbcon = connect_database('debridcache_db')
 			dbcon.execute('DELETE FROM debrid_data')
 			dbcon.execute('VACUUM')
-			dbcon.close()
 			return True
 		except: return False
 
 	def clean_database(self):
 		try:
 			dbcon = connect_database('debridcache_db')
-			dbcon.execute('DELETE from debrid_data WHERE CAST(expires AS INT) <= ?', (get_timestamp(),))
+			dbcon.execute('DELETE from debrid_data WHERE expires <= ?', (get_timestamp(),))
 			dbcon.execute('VACUUM')
-			dbcon.close()
 			return True
 		except: return False
 
@@ -1,15 +1,15 @@
 # -*- coding: utf-8 -*-
-from caches.base_cache import connect_database
+from caches.base_cache import connect_database, encode_data, decode_data
 # from modules.kodi_utils import logger
 
 class EpisodeGroupsCache:
 	def get(self, tmdb_id):
-		try: data = eval(connect_database('episode_groups_db').execute('SELECT data FROM groups_data WHERE tmdb_id = ?', (str(tmdb_id),)).fetchone()[0])
+		try: data = decode_data(connect_database('episode_groups_db').execute('SELECT data FROM groups_data WHERE tmdb_id = ?', (str(tmdb_id),)).fetchone()[0])
 		except: data = {}
 		return data
 
 	def set(self, tmdb_id, data):
-		connect_database('episode_groups_db').execute('INSERT OR REPLACE INTO groups_data VALUES (?, ?)', (str(tmdb_id), repr(data)))
+		connect_database('episode_groups_db').execute('INSERT OR REPLACE INTO groups_data VALUES (?, ?)', (str(tmdb_id), encode_data(data)))
 
 	def delete(self, tmdb_id):
 		dbcon = connect_database('episode_groups_db')
@@ -1,5 +1,5 @@
 # -*- coding: utf-8 -*-
-from caches.base_cache import connect_database, get_timestamp
+from caches.base_cache import connect_database, get_timestamp, encode_data, decode_data
 # from modules.kodi_utils import logger
 
 class ExternalCache(object):
@@ -10,7 +10,7 @@ class ExternalCache(object):
 				'SELECT results, expires FROM results_data WHERE provider = ? AND db_type = ? AND tmdb_id = ? AND title = ? AND year = ? AND season = ? AND episode = ?',
 				(source, media_type, tmdb_id, title, year, season, episode)).fetchone()
 			if cache_data:
-				if cache_data[1] > get_timestamp(): result = eval(cache_data[0])
+				if cache_data[1] > get_timestamp(): result = decode_data(cache_data[0])
 				else: self.delete(source, media_type, title, year, tmdb_id, season, episode)
 		except: pass
 		return result
@@ -19,7 +19,7 @@ class ExternalCache(object):
 		try:
 			expires = get_timestamp(expire_time)
 			self._execute('INSERT OR REPLACE INTO results_data VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
-				(source, media_type, tmdb_id, title, year, season, episode, repr(results or []), int(expires)))
+				(source, media_type, tmdb_id, title, year, season, episode, encode_data(results or []), int(expires)))
 		except: pass
 
 	def delete(self, source, media_type, tmdb_id, title, season, episode):
@@ -43,14 +43,12 @@ class ExternalCache(object):
 		except: return False
 
 	def _execute(self, command, params):
-		self.dbcon = connect_database('external_db')
-		return self.dbcon.execute(command, params)
+		return connect_database('external_db').execute(command, params)
 
 	def clean_database(self):
 		try:
 			dbcon = connect_database('external_db')
 			dbcon.execute('DELETE from results_data WHERE CAST(expires AS INT) <= ?', (get_timestamp(),))
-			dbcon.close()
 			self._vacuum()
 			return True
 		except: return False
@@ -58,6 +56,5 @@ class ExternalCache(object):
 	def _vacuum(self):
 		dbcon = connect_database('external_db')
 		dbcon.execute('VACUUM')
-		dbcon.close()
 
 external_cache = ExternalCache()
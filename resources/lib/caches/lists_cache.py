@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
-from caches.base_cache import BaseCache, get_timestamp
+from caches.base_cache import BaseCache, get_timestamp, fetch_object, stale_while_revalidate, revalidate
 # from modules.kodi_utils import logger
 
 class ListsCache(BaseCache):
+	use_validators, stale_window = True, 168
+
 	def __init__(self):
 		BaseCache.__init__(self, 'lists_db', 'lists')
 
@@ -10,6 +12,7 @@ class ListsCache(BaseCache):
 		try:
 			dbcon = self.manual_connect('lists_db')
 			dbcon.execute('DELETE FROM lists')
+			dbcon.execute('DELETE FROM validators')
 			dbcon.execute('VACUUM')
 			return True
 		except: return False
@@ -18,6 +21,7 @@ class ListsCache(BaseCache):
 		try:
 			dbcon = self.manual_connect('lists_db')
 			dbcon.execute('DELETE from lists WHERE CAST(expires AS INT) <= ?', (get_timestamp(),))
+			dbcon.execute('DELETE FROM validators WHERE id NOT IN (SELECT id FROM lists)')
 			dbcon.execute('VACUUM')
 			return True
 		except: return False
@@ -29,7 +33,7 @@ def lists_cache_object(function, string, args, json=False, expiration=48):
 	if cache is not None: return cache
 	if isinstance(args, list): args = tuple(args)
 	else: args = (args,)
-	if json: result = function(*args).json()
-	else: result = function(*args)
-	lists_cache.set(string, result, expiration=expiration)
-	return result
\ No newline at end of file
+	expired, validators = lists_cache.get_expired(string)
+	if expired is not None and stale_while_revalidate():
+		return revalidate(string, lambda: fetch_object(lists_cache, function, string, args, json, expiration, expired, validators), expired)
+	return fetch_object(lists_cache, function, string, args, json, expiration, expired, validators)
\ No newline at end of file
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
-from caches.base_cache import BaseCache, get_timestamp
+from caches.base_cache import BaseCache, get_timestamp, fetch_object, stale_while_revalidate, revalidate
 # from modules.kodi_utils import logger
 
 class MainCache(BaseCache):
+	use_validators, stale_window = True, 168
+
 	def __init__(self):
 		BaseCache.__init__(self, 'maincache_db', 'maincache')
 
@@ -10,6 +12,7 @@ class MainCache(BaseCache):
 		try:
 			dbcon = self.manual_connect('maincache_db')
 			dbcon.execute('DELETE FROM maincache')
+			dbcon.execute('DELETE FROM validators')
 			dbcon.execute('VACUUM')
 			return True
 		except: return False
@@ -26,6 +29,7 @@ class MainCache(BaseCache):
 		try:
 			dbcon = self.manual_connect('maincache_db')
 			dbcon.execute('DELETE from maincache WHERE CAST(expires AS INT) <= ?', (get_timestamp(),))
+			dbcon.execute('DELETE FROM validators WHERE id NOT IN (SELECT id FROM maincache)')
 			dbcon.execute('VACUUM')
 			return True
 		except: return False
@@ -37,7 +41,7 @@ def cache_object(function, string, args, json=True, expiration=24):
 	if cache is not None: return cache
 	if isinstance(args, list): args = tuple(args)
 	else: args = (args,)
-	if json: result = function(*args).json()
-	else: result = function(*args)
-	main_cache.set(string, result, expiration=expiration)
-	return result
+	expired, validators = main_cache.get_expired(string)
+	if expired is not None and stale_while_revalidate():
+		return revalidate(string, lambda: fetch_object(main_cache, function, string, args, json, expiration, expired, validators), expired)
+	return fetch_object(main_cache, function, string, args, json, expiration, expired, validators)
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from time import time
+from threading import Lock
+from collections import OrderedDict
+# from modules.kodi_utils import logger
+
+class MemoryCache:
+	# Object level LRU cache bounded by entry count and approximate size in bytes. Entries carry their own expiry.
+	# Living at module level, it survives between plugin calls when the language invoker is reused.
+	# Dicts are stored and handed out as shallow copies, as callers add keys to the meta they are given.
+	def __init__(self, max_entries, max_bytes):
+		self.max_entries, self.max_bytes = max_entries, max_bytes
+		self.data, self.lock, self.size, self.generation = OrderedDict(), Lock(), 0, None
+		self.hits, self.misses, self.evictions = 0, 0, 0
+
+	def get(self, key, current_time=None):
+		with self.lock:
+			try: expires, value, size = self.data[key]
+			except KeyError:
+				self.misses += 1
+				return None
+			if expires <= (current_time or time()):
+				del self.data[key]
+				self.size -= size
+				self.misses += 1
+				return None
+			self.data.move_to_end(key)
+			self.hits += 1
+		if isinstance(value, dict): return dict(value)
+		return value
+
+	def set(self, key, value, expires, size):
+		if isinstance(value, dict): value = dict(value)
+		with self.lock:
+			if key in self.data: self.size -= self.data.pop(key)[2]
+			self.data[key] = (expires, value, size)
+			self.size += size
+			while len(self.data) > self.max_entries or self.size > self.max_bytes:
+				self.size -= self.data.popitem(last=False)[1][2]
+				self.evictions += 1
+
+	def delete(self, key):
+		with self.lock:
+			try: self.size -= self.data.pop(key)[2]
+			except KeyError: pass
+
+	def clear(self, generation=None):
+		with self.lock:
+			self.data.clear()
+			self.size, self.generation = 0, generation
+
+	def stats(self):
+		with self.lock:
+			total = self.hits + self.misses
+			return {'entries': len(self.data), 'bytes': self.size, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+					'hit_rate': round(float(self.hits) / total, 3) if total else 0.0}
+
+meta_memory_cache = MemoryCache(1000, 16 * 1024 * 1024)
@@ -1,37 +1,76 @@
 # -*- coding: utf-8 -*-
-from caches.base_cache import connect_database, get_timestamp
+from time import time
+from threading import Lock
+from caches.base_cache import connect_database, get_timestamp, encode_data, decode_data, encode_property, decode_property, get_validators, set_validators, conditional_call, single_flight
+from caches.memory_cache import meta_memory_cache
 from modules.kodi_utils import get_property, set_property, clear_property
 # from modules.kodi_utils import logger
 
+memory_generation_prop = 'fenlight.meta_memory_generation'
+
 class MetaCache:
+	buffer_size, buffer_time = 40, 5
+
+	def __init__(self):
+		self.write_buffer, self.write_lock, self.buffering, self.buffer_started = [], Lock(), 0, 0
+
 	def get(self, media_type, id_type, media_id, current_time=None):
 		meta = None
 		try:
 			media_id = str(media_id)
 			if not current_time: current_time = get_timestamp()
+			self.check_memory_generation()
 			meta = self.get_memory_cache(media_type, id_type, media_id, current_time)
 			if meta is None:
 				dbcon = connect_database('metacache_db')
 				cache_data = dbcon.execute('SELECT meta, expires FROM metadata WHERE db_type = ? AND %s = ?' % id_type, (media_type, media_id)).fetchone()
 				if cache_data:
-					meta, expiry = eval(cache_data[0]), cache_data[1]
+					meta, expiry = decode_data(cache_data[0]), cache_data[1]
 					if expiry < current_time:
-						self.delete(media_type, id_type, media_id, meta=meta)
+						self.delete(media_type, id_type, media_id, meta=meta, expired=True)
 						meta = None
 					else: self.set_memory_cache(media_type, id_type, meta, expiry, media_id)
 		except: pass
 		return meta
 
+	def get_many(self, media_type, id_type, media_ids, current_time=None):
+		# Returns {media_id: meta} for every id found in the memory or database cache. Missing or expired ids are left out.
+		results = {}
+		if id_type not in ('tmdb_id', 'imdb_id', 'tvdb_id'): return results
+		try:
+			if not current_time: current_time = get_timestamp()
+			self.check_memory_generation()
+			misses = []
+			for media_id in set(str(i) for i in media_ids):
+				meta = self.get_memory_cache(media_type, id_type, media_id, current_time)
+				if meta is None: misses.append(media_id)
+				else: results[media_id] = meta
+			if not misses: return results
+			dbcon = connect_database('metacache_db')
+			for chunk in [misses[i:i + 500] for i in range(0, len(misses), 500)]:
+				cache_data = dbcon.execute('SELECT %s, meta, expires FROM metadata WHERE db_type = ? AND %s IN (%s)' \
+											% (id_type, id_type, ', '.join('?' for _ in chunk)), [media_type] + chunk).fetchall()
+				for media_id, meta, expiry in cache_data:
+					media_id, meta = str(media_id), decode_data(meta)
+					if expiry < current_time:
+						self.delete(media_type, id_type, media_id, meta=meta, expired=True)
+						continue
+					results[media_id] = meta
+					self.set_memory_cache(media_type, id_type, meta, expiry, media_id)
+		except: pass
+		return results
+
 	def get_season(self, prop_string):
 		meta = None
 		try:
 			current_time = get_timestamp()
+			self.check_memory_generation()
 			meta = self.get_memory_cache_season(prop_string, current_time)
 			if meta is None:
 				dbcon = connect_database('metacache_db')
 				cache_data = dbcon.execute('SELECT meta, expires FROM season_metadata WHERE tmdb_id = ?', (prop_string,)).fetchone()
 				if cache_data:
-					meta, expiry = eval(cache_data[0]), cache_data[1]
+					meta, expiry = decode_data(cache_data[0]), cache_data[1]
 					if expiry < current_time:
 						self.delete_season(prop_string)
 						meta = None
@@ -41,30 +80,58 @@ class MetaCache:
 
 	def set(self, media_type, id_type, meta, expiration=168, current_time=None):
 		try:
-			dbcon = connect_database('metacache_db')
 			meta_get = meta.get
 			if current_time: expires = current_time + (expiration*3600)
 			else: expires = get_timestamp(expiration)
 			media_id = str(meta_get(id_type))
-			dbcon.execute('INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)',
-				(media_type, str(meta_get('tmdb_id')), meta_get('imdb_id'), str(meta_get('tvdb_id')), repr(meta), expires))
+			row = (media_type, str(meta_get('tmdb_id')), meta_get('imdb_id'), str(meta_get('tvdb_id')), encode_data(meta), expires)
+			if self.buffering: self.buffer_row(row)
+			else: connect_database('metacache_db').execute('INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)', row)
 		except: return None
 		self.set_memory_cache(media_type, id_type, meta, expires, media_id)
 
+	def start_buffer(self):
+		# While buffering, set() only fills the memory cache and queues its row. Rows are written in one transaction
+		# when the buffer reaches buffer_size rows or buffer_time seconds, and when flush_buffer() is called.
+		with self.write_lock: self.buffering += 1
+
+	def buffer_row(self, row):
+		with self.write_lock:
+			if not self.write_buffer: self.buffer_started = time()
+			self.write_buffer.append(row)
+			flush = len(self.write_buffer) >= self.buffer_size or time() - self.buffer_started >= self.buffer_time
+		if flush: self.flush_buffer(stop=False)
+
+	def flush_buffer(self, stop=True):
+		with self.write_lock:
+			if stop: self.buffering = max(self.buffering - 1, 0)
+			insert_list, self.write_buffer = self.write_buffer, []
+		if not insert_list: return
+		try:
+			dbcon = connect_database('metacache_db')
+			dbcon.execute('BEGIN IMMEDIATE')
+			try:
+				dbcon.executemany('INSERT OR REPLACE INTO metadata VALUES (?, ?, ?, ?, ?, ?)', insert_list)
+				dbcon.execute('COMMIT')
+			except:
+				dbcon.execute('ROLLBACK')
+		except: pass
+
 	def set_season(self, prop_string, meta, expiration=168):
 		try:
 			dbcon = connect_database('metacache_db')
 			expires = get_timestamp(expiration)
-			dbcon.execute('INSERT INTO season_metadata VALUES (?, ?, ?)', (prop_string, repr(meta), int(expires)))
+			dbcon.execute('INSERT INTO season_metadata VALUES (?, ?, ?)', (prop_string, encode_data(meta), int(expires)))
 		except: return None
 		self.set_memory_cache_season(prop_string, meta, expires)
 
-	def delete(self, media_type, id_type, media_id, meta=None):
+	def delete(self, media_type, id_type, media_id, meta=None, expired=False):
 		try:
 			dbcon = connect_database('metacache_db')
 			dbcon.execute('DELETE FROM metadata WHERE db_type = ? AND %s = ?' % id_type, (media_type, media_id))
 			for item in ('tmdb_id', 'imdb_id', 'tvdb_id'): self.delete_memory_cache(media_type, item, meta[item])
 			if media_type == 'tvshow': self.delete_all_seasons(media_id)
+			if not expired: self.bump_memory_generation()
 		except: return
 
 	def delete_season(self, prop_string):
@@ -75,39 +142,61 @@ class MetaCache:
 		except: return
 
 	def get_memory_cache(self, media_type, id_type, media_id, current_time):
-		try:
-			prop_string = 'fenlight.%s_%s_%s' % (media_type, id_type, media_id)
-			cachedata = eval(get_property(prop_string))
-			if cachedata[0] > current_time: result = cachedata[1]
-		except: result = None
-		return result
+		return self.get_memory_item('fenlight.%s_%s_%s' % (media_type, id_type, media_id), current_time)
 
 	def get_memory_cache_season(self, prop_string, current_time):
+		return self.get_memory_item('fenlight.meta_season_%s' % prop_string, current_time)
+
+	def set_memory_cache(self, media_type, id_type, meta, expires, media_id):
+		self.set_memory_item('fenlight.%s_%s_%s' % (media_type, id_type, media_id), meta, expires)
+
+	def set_memory_cache_season(self, prop_string, meta, expires):
+		self.set_memory_item('fenlight.meta_season_%s' % prop_string, meta, expires)
+
+	def delete_memory_cache(self, media_type, id_type, media_id):
+		self.delete_memory_item('fenlight.%s_%s_%s' % (media_type, id_type, media_id))
+
+	def delete_memory_cache_season(self, prop_string):
+		self.delete_memory_item('fenlight.meta_season_%s' % prop_string)
+
+	def get_memory_item(self, prop_string, current_time):
+		# In-process LRU first. The window property is the fallback shared with other add-on processes, and a hit there
+		# is promoted into the LRU so the next read skips the decode.
+		result = meta_memory_cache.get(prop_string, current_time)
+		if result is not None: return result
 		try:
-			cachedata = eval(get_property('fenlight.meta_season_%s' % prop_string))
-			if cachedata[0] > current_time: result = cachedata[1]
+			cache_property = get_property(prop_string)
+			cachedata = decode_property(cache_property)
+			if cachedata[0] > current_time:
+				result = cachedata[1]
+				meta_memory_cache.set(prop_string, result, cachedata[0], len(cache_property))
 		except: result = None
 		return result
 
-	def set_memory_cache(self, media_type, id_type, meta, expires, media_id):
+	def set_memory_item(self, prop_string, meta, expires):
 		try:
-			cachedata, prop_string = (expires, meta), 'fenlight.%s_%s_%s' % (media_type, id_type, media_id)
-			set_property(prop_string, repr(cachedata))
+			self.check_memory_generation()
+			cache_property = encode_property((expires, meta))
+			meta_memory_cache.set(prop_string, meta, expires, len(cache_property))
+			set_property(prop_string, cache_property)
 		except: pass
 
-	def set_memory_cache_season(self, prop_string, meta, expires):
-		try:
-			cachedata = (expires, meta)
-			set_property('fenlight.meta_season_%s' % prop_string, repr(cachedata))
+	def delete_memory_item(self, prop_string):
+		meta_memory_cache.delete(prop_string)
+		try: clear_property(prop_string)
 		except: pass
 
-	def delete_memory_cache(self, media_type, id_type, media_id):
-		try: clear_property('fenlight.%s_%s_%s' % (media_type, id_type, media_id))
-		except: pass
+	def check_memory_generation(self):
+		# Deletes made by another add-on process bump the generation property, which empties this process's LRU.
+		generation = get_property(memory_generation_prop)
+		if generation != meta_memory_cache.generation: meta_memory_cache.clear(generation)
 
-	def delete_memory_cache_season(self, prop_string):
-		try: clear_property('fenlight.meta_season_%s' % prop_string)
-		except: pass
+	def bump_memory_generation(self):
+		meta_memory_cache.clear(str(time()))
+		set_property(memory_generation_prop, meta_memory_cache.generation)
+
+	def memory_stats(self):
+		return meta_memory_cache.stats()
 
 	def get_function(self, prop_string):
 		result = None
@@ -116,16 +205,33 @@ class MetaCache:
 			current_time = get_timestamp()
 			cache_data = dbcon.execute('SELECT string_id, data, expires FROM function_cache WHERE string_id = ?', (prop_string,)).fetchone()
 			if cache_data:
-				if cache_data[2] > current_time: result = eval(cache_data[1])
-				else: dbcon.execute('DELETE FROM function_cache WHERE string_id = ?', (prop_string,))
+				if cache_data[2] > current_time: result = decode_data(cache_data[1])
+				elif not get_validators(dbcon, prop_string): dbcon.execute('DELETE FROM function_cache WHERE string_id = ?', (prop_string,))
 		except: pass
 		return result
 
-	def set_function(self, prop_string, result, expiration=24):
+	def get_expired_function(self, prop_string):
+		try:
+			dbcon = connect_database('metacache_db')
+			validators = get_validators(dbcon, prop_string)
+			if not validators: return None, None
+			cache_data = dbcon.execute('SELECT data FROM function_cache WHERE string_id = ?', (prop_string,)).fetchone()
+			if cache_data: return decode_data(cache_data[0]), validators
+		except: pass
+		return None, None
+
+	def set_function(self, prop_string, result, expiration=24, validators=None):
 		try:
 			dbcon = connect_database('metacache_db')
 			expires = get_timestamp(expiration)
-			dbcon.execute('INSERT INTO function_cache VALUES (?, ?, ?)', (prop_string, repr(result), expires))
+			dbcon.execute('INSERT OR REPLACE INTO function_cache VALUES (?, ?, ?)', (prop_string, encode_data(result), expires))
+			if validators is not None: set_validators(dbcon, prop_string, validators)
+		except: return
+
+	def refresh_function(self, prop_string, expiration=24):
+		try:
+			dbcon = connect_database('metacache_db')
+			dbcon.execute('UPDATE function_cache SET expires = ? WHERE string_id = ?', (get_timestamp(expiration), prop_string))
 		except: return
 
 	def delete_all_seasons(self, media_id):
@@ -140,7 +246,8 @@ class MetaCache:
 			for i in dbcon.execute('SELECT tmdb_id FROM season_metadata'):
 				try: self.delete_memory_cache_season(str(i[0]))
 				except: pass
-			for i in ('metadata', 'season_metadata', 'function_cache'): dbcon.execute('DELETE FROM %s' % i)
+			for i in ('metadata', 'season_metadata', 'function_cache', 'validators'): dbcon.execute('DELETE FROM %s' % i)
+			self.bump_memory_generation()
 			dbcon.execute('VACUUM')
 		except: return
 
@@ -149,6 +256,7 @@ class MetaCache:
 			dbcon = connect_database('metacache_db')
 			for table in ('metadata', 'function_cache', 'season_metadata'):
 				dbcon.execute('DELETE from %s WHERE CAST(expires AS INT) <= ?' % table, (get_timestamp(),))
+			dbcon.execute('DELETE FROM validators WHERE id NOT IN (SELECT string_id FROM function_cache)')
 			dbcon.execute('VACUUM')
 			return True
 		except: return False
@@ -158,9 +266,15 @@ meta_cache = MetaCache()
 def cache_function(function, prop_string, url, expiration=720, json=True):
 	data = meta_cache.get_function(prop_string)
 	if data: return data
-	if json: result = function(url).json()
-	else: result = function(url)
-	meta_cache.set_function(prop_string, result, expiration=expiration)
+	return single_flight.do(('metacache_db', prop_string), fetch_function, function, prop_string, url, expiration, json)
+
+def fetch_function(function, prop_string, url, expiration, json):
+	expired, validators = meta_cache.get_expired_function(prop_string)
+	result, validators, not_modified = conditional_call(function, (url,), json, validators)
+	if not_modified:
+		meta_cache.refresh_function(prop_string, expiration)
+		return expired
+	meta_cache.set_function(prop_string, result, expiration=expiration, validators=validators)
 	return result
 
 def delete_meta_cache(silent=False):
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 from threading import Thread
-from caches.base_cache import connect_database
+from caches.base_cache import connect_database, encode_data, decode_data, stale_while_revalidate, revalidate, update_watched_shows, get_validators, set_validators, \
+								conditional_call
 from modules.kodi_utils import sleep, confirm_dialog, close_all_dialog
 # from modules.kodi_utils import logger
 
@@ -10,20 +11,39 @@ class TraktCache:
 		try:
 			dbcon = connect_database('trakt_db')
 			cache_data = dbcon.execute('SELECT data FROM trakt_data WHERE id = ?', (string,)).fetchone()
-			if cache_data: result = eval(cache_data[0])
+			if cache_data: result = decode_data(cache_data[0])
 		except: pass
 		return result
 
-	def set(self, string, data):
+	def set(self, string, data, validators=None):
 		try:
 			dbcon = connect_database('trakt_db')
-			dbcon.execute('INSERT OR REPLACE INTO trakt_data (id, data) VALUES (?, ?)', (string, repr(data)))
+			dbcon.execute('INSERT OR REPLACE INTO trakt_data (id, data) VALUES (?, ?)', (string, encode_data(data)))
+			dbcon.execute('DELETE FROM trakt_stale WHERE id = ?', (string,))
+			if validators is not None: set_validators(dbcon, string, validators)
 		except: return None
 
+	def get_stale(self, string):
+		# The stale copy and the validators it was fetched with, or (None, None).
+		try:
+			dbcon = connect_database('trakt_db')
+			cache_data = dbcon.execute('SELECT data FROM trakt_stale WHERE id = ?', (string,)).fetchone()
+			if cache_data: return decode_data(cache_data[0]), get_validators(dbcon, string)
+		except: pass
+		return None, None
+
+	def clear(self, where, args=()):
+		# Cleared rows are kept aside as stale copies that widgets can show while the fresh data is fetched, and that a 304 puts back.
+		# Their validators are left in place for that revalidation.
+		dbcon = connect_database('trakt_db')
+		dbcon.execute('INSERT OR REPLACE INTO trakt_stale SELECT id, data FROM trakt_data WHERE %s' % where, args)
+		dbcon.execute('DELETE FROM trakt_data WHERE %s' % where, args)
+
 	def delete(self, string):
 		try:
 			dbcon = connect_database('trakt_db')
 			dbcon.execute('DELETE FROM trakt_data WHERE id = ?', (string,))
+			dbcon.execute('DELETE FROM validators WHERE id = ?', (string,))
 		except: pass
 
 trakt_cache = TraktCache()
@@ -35,7 +55,7 @@ class TraktWatched():
 
 	def set_tvshow_status(self, insert_dict):
 		dbcon = connect_database('trakt_db')
-		dbcon.execute('INSERT OR REPLACE INTO trakt_data (id, data) VALUES (?, ?)', ('trakt_tvshow_status', repr(insert_dict),))
+		dbcon.execute('INSERT OR REPLACE INTO trakt_data (id, data) VALUES (?, ?)', ('trakt_tvshow_status', encode_data(insert_dict),))
 
 	def set_bulk_movie_watched(self, insert_list):
 		self._delete('DELETE FROM watched WHERE db_type = ?', ('movie',))
@@ -44,6 +64,23 @@ class TraktWatched():
 	def set_bulk_tvshow_watched(self, insert_list):
 		self._delete('DELETE FROM watched WHERE db_type = ?', ('episode',))
 		self._executemany('INSERT OR IGNORE INTO watched VALUES (?, ?, ?, ?, ?, ?)', insert_list)
+		update_watched_shows(connect_database('trakt_db'))
+
+	def set_tvshow_watched(self, insert_list):
+		# Merges new plays into the table, keeping the latest last_played of each episode.
+		self._executemany('INSERT INTO watched VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (db_type, media_id, season, episode) \
+							DO UPDATE SET last_played = MAX(last_played, excluded.last_played)', insert_list)
+		update_watched_shows(connect_database('trakt_db'), [i[1] for i in insert_list])
+
+	def reset_tvshow_watched(self, resets):
+		# resets holds (media_id, reset_at) pairs. Episodes last played before their show's progress reset are no longer watched.
+		dbcon = connect_database('trakt_db')
+		dbcon.executemany('DELETE FROM watched WHERE db_type = ? AND media_id = ? AND last_played < ?', [('episode', str(i[0]), i[1]) for i in resets])
+		update_watched_shows(dbcon, [i[0] for i in resets])
+
+	def tvshow_watched_count(self):
+		dbcon = connect_database('trakt_db')
+		return dbcon.execute('SELECT COUNT(*) FROM watched WHERE db_type = ?', ('episode',)).fetchone()[0]
 
 	def set_bulk_movie_progress(self, insert_list):
 		self._delete('DELETE FROM progress WHERE db_type = ?', ('movie',))
@@ -67,8 +104,18 @@ trakt_watched_cache = TraktWatched()
 def cache_trakt_object(function, string, url):
 	cache = trakt_cache.get(string)
 	if cache is not None: return cache
-	result = function(url)
-	trakt_cache.set(string, result)
+	stale, validators = trakt_cache.get_stale(string)
+	if stale is not None and stale_while_revalidate(): return revalidate(string, lambda: fetch_trakt_object(function, string, url, stale, validators), stale)
+	return fetch_trakt_object(function, string, url, stale, validators)
+
+def fetch_trakt_object(function, string, url, stale=None, validators=None):
+	# The request is sent with the validators of the stale copy, and a 304 keeps that copy instead of downloading it again.
+	if stale is None: validators = None
+	result, validators, not_modified = conditional_call(function, (url,), False, validators)
+	if not_modified:
+		trakt_cache.set(string, stale)
+		return stale
+	trakt_cache.set(string, result, validators)
 	return result
 
 def reset_activity(latest_activities):
@@ -76,7 +123,7 @@ def reset_activity(latest_activities):
 	try:
 		dbcon = connect_database('trakt_db')
 		data = dbcon.execute('SELECT data FROM trakt_data WHERE id = ?', (string,)).fetchone()
-		if data: cached_data = eval(data[0])
+		if data: cached_data = decode_data(data[0])
 		else: cached_data = default_activities()
 		dbcon.execute('DELETE FROM trakt_data WHERE id=?', (string,))
 		trakt_cache.set(string, latest_activities)
@@ -91,18 +138,14 @@ def clear_daily_cache():
 
 def clear_trakt_hidden_data(list_type):
 	string = 'trakt_hidden_items_%s' % list_type
-	try:
-		dbcon = connect_database('trakt_db')
-		dbcon.execute('DELETE FROM trakt_data WHERE id=?', (string,))
+	try: trakt_cache.clear('id=?', (string,))
 	except: pass
 
 def clear_trakt_collection_watchlist_data(list_type, media_type):
 	if media_type == 'movies': media_type = 'movie'
 	if media_type in ('tvshows', 'shows'): media_type = 'tvshow'
 	string = 'trakt_%s_%s' % (list_type, media_type)
-	try:
-		dbcon = connect_database('trakt_db')
-		dbcon.execute('DELETE FROM trakt_data WHERE id=?', (string,))
+	try: trakt_cache.clear('id=?', (string,))
 	except: pass
 
 def clear_trakt_calendar():
@@ -113,28 +156,20 @@ def clear_trakt_calendar():
 
 def clear_trakt_list_contents_data(list_type):
 	string = 'trakt_list_contents_' + list_type + '_%'
-	try:
-		dbcon = connect_database('trakt_db')
-		dbcon.execute('DELETE FROM trakt_data WHERE id LIKE "%s"' % string)
+	try: trakt_cache.clear('id LIKE ?', (string,))
 	except: pass
 
 def clear_trakt_list_data(list_type):
 	string = 'trakt_%s' % list_type
-	try:
-		dbcon = connect_database('trakt_db')
-		dbcon.execute('DELETE FROM trakt_data WHERE id=?', (string,))
+	try: trakt_cache.clear('id=?', (string,))
 	except: pass
 
 def clear_trakt_recommendations():
-	try:
-		dbcon = connect_database('trakt_db')
-		dbcon.execute('DELETE FROM trakt_data WHERE id LIKE "%s"' % 'trakt_recommendations_%')
+	try: trakt_cache.clear('id LIKE ?', ('trakt_recommendations_%',))
 	except: return
 
 def clear_trakt_favorites():
-	try:
-		dbcon = connect_database('trakt_db')
-		dbcon.execute('DELETE FROM trakt_data WHERE id LIKE "%s"' % 'trakt_favorites_%')
+	try: trakt_cache.clear('id LIKE ?', ('trakt_favorites_%',))
 	except: return
 
 def clear_all_trakt_cache_data(silent=False, refresh=True):
@@ -149,7 +184,7 @@ def clear_all_trakt_cache_data(silent=False, refresh=True):
 			except: pass
 		main_cache.clean_database()
 		dbcon = connect_database('trakt_db')
-		for table in ('trakt_data', 'progress', 'watched', 'watched_status'): dbcon.execute('DELETE FROM %s' % table)
+		for table in ('trakt_data', 'trakt_stale', 'validators', 'progress', 'watched', 'watched_status', 'watched_shows'): dbcon.execute('DELETE FROM %s' % table)
 		dbcon.execute('VACUUM')
 		if refresh:
 			from apis.trakt_api import trakt_sync_activities
@@ -2,7 +2,7 @@
 import sys
 from modules import kodi_utils, settings, watched_status as ws
 from modules.metadata import tvshow_meta, episodes_meta, all_episodes_meta
-from modules.utils import jsondate_to_datetime, adjust_premiered_date, make_day, get_datetime, get_current_timestamp, title_key, date_difference, TaskPool
+from modules.utils import jsondate_to_datetime, adjust_premiered_date, make_day, get_datetime, get_current_timestamp, title_key, date_difference, worker_pool
 # logger = kodi_utils.logger
 
 def build_episode_list(params):
@@ -257,7 +257,7 @@ def build_single_episode(list_type, params={}):
 											'season': season, 'episode': episode, 'refresh': 'true'}))])
 				if unwatched_info:
 					total_aired_eps = meta_get('total_aired_eps')
-					total_unwatched = ws.get_watched_status_tvshow(ws.watched_info_tvshow(watched_db).get(str(tmdb_id), None), total_aired_eps)[2]
+					total_unwatched = ws.get_watched_status_tvshow(ws.watched_info_tvshow(watched_db, tmdb_id).get(str(tmdb_id), None), total_aired_eps)[2]
 					if total_aired_eps != total_unwatched: set_properties({'watchedepisodes': '1', 'unwatchedepisodes': str(total_unwatched)})
 			if list_type_starts_with('next_') and (season, episode) != (1, 1):
 				cm_append(['unmark_previous_episode', ('[B]Unmark Previous Watched[/B]', 'RunPlugin(%s)' % \
@@ -364,8 +364,7 @@ def build_single_episode(list_type, params={}):
 	else: data, return_results = sorted(params, key=lambda i: i['custom_order']), True
 	list_type_compare = list_type.split('episode.')[1]
 	list_type_starts_with = list_type_compare.startswith
-	threads = TaskPool().tasks_enumerate(_process, data, min(len(data), settings.max_threads()))
-	[i.join() for i in threads]
+	worker_pool().starmap(_process, enumerate(data, 1))
 	if return_results: return [(i['list_items'], i['sort_order']) for i in item_list]
 	if list_type_starts_with('next_'):
 		def func(function):
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 import sys
-from modules.metadata import movie_meta, movieset_meta
-from modules.utils import get_datetime, get_current_timestamp, paginate_list, jsondate_to_datetime, TaskPool, manual_function_import
+from modules.metadata import movie_meta, movieset_meta, cached_meta_many, movie_meta_many
+from caches.meta_cache import meta_cache
+from modules.utils import get_datetime, get_current_timestamp, paginate_list, jsondate_to_datetime, worker_pool, manual_function_import
 from modules import kodi_utils, settings, watched_status
 # logger = kodi_utils.logger
 
@@ -116,9 +117,9 @@ class Movies:
 			if self.params_get('refreshed') == 'true': kodi_utils.sleep(1000)
 			kodi_utils.set_view_mode('view.movies', 'movies', self.is_external)
 		
-	def build_movie_content(self, _position, _id):
+	def build_movie_content(self, _position, _id, meta=None):
 		try:
-			meta = movie_meta(self.id_type, _id, self.tmdb_api_key, self.mpaa_region, self.current_date, self.current_time)
+			if meta is None: meta = movie_meta(self.id_type, _id, self.tmdb_api_key, self.mpaa_region, self.current_date, self.current_time)
 			if not meta or 'blank_entry' in meta: return
 			listitem = self.make_listitem()
 			cm = []
@@ -245,14 +246,22 @@ class Movies:
 		open_action = settings.media_open_action('movie')
 		self.open_movieset = open_action in (2, 3) and not self.movieset_list_active
 		self.open_extras = open_action in (1, 3)
-		if self.custom_order:
-			threads = TaskPool().tasks(self.build_movie_content, self.list, min(len(self.list), settings.max_threads()))
-			[i.join() for i in threads]
-		else:
-			threads = TaskPool().tasks_enumerate(self.build_movie_content, self.list, min(len(self.list), settings.max_threads()))
-			[i.join() for i in threads]
-			self.items.sort(key=lambda k: k[1])
-			self.items = [i[0] for i in self.items]
+		meta_cache.start_buffer()
+		try:
+			page = self.list if self.custom_order else list(enumerate(self.list, 1))
+			cached = cached_meta_many('movie', self.id_type, [i[1] for i in page], self.current_time)
+			misses = []
+			for item, meta in zip(page, cached):
+				if meta is None: misses.append(item)
+				else: self.build_movie_content(*item, meta=meta)
+			if misses and self.id_type in ('tmdb_id', 'imdb_id') and settings.async_metadata():
+				metas = movie_meta_many(self.id_type, [i[1] for i in misses], self.tmdb_api_key, self.mpaa_region, self.current_date, self.current_time)
+				misses = [(position, media_id, meta) for (position, media_id), meta in zip(misses, metas)]
+			worker_pool().starmap(self.build_movie_content, misses)
+			if not self.custom_order:
+				self.items.sort(key=lambda k: k[1])
+				self.items = [i[0] for i in self.items]
+		finally: meta_cache.flush_buffer()
 		return self.items
 
 	def sort_context_menu(self, context_menu_items):
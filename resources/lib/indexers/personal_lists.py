@@ -11,7 +11,7 @@ from indexers.movies import Movies
 from indexers.tvshows import TVShows
 from modules import metadata
 from modules import kodi_utils, settings
-from modules.utils import TaskPool, paginate_list, sort_for_article, get_datetime, get_current_timestamp, make_image, download_image
+from modules.utils import worker_pool, paginate_list, sort_for_article, get_datetime, get_current_timestamp, make_image, download_image
 # logger = kodi_utils.logger
 
 def get_personal_lists(params):
@@ -464,8 +464,7 @@ class ExternalImport:
 		elif self.import_indicator == 'progress':
 			self.progressDialog = kodi_utils.progress_dialog('Importing Media', kodi_utils.get_icon('lists'))
 			kodi_utils.sleep(1000)
-		threads = TaskPool().tasks(self.process, self.item_list, min(self.total_items, settings.max_threads()))
-		[i.join() for i in threads]
+		worker_pool().map(self.process, self.item_list)
 		self.results.sort(key=lambda k: k['order'])
 		success = personal_lists_cache.make_list(self.list_name, self.author, '1', self.description, seen='true' if self.action == 'import_view' else 'false')
 		if not success: return kodi_utils.notification('Error Creating [B]%s[/B]' % self.list_name, 3000)
@@ -123,6 +123,6 @@ def single_seasons(seasons_list):
 	def _process(item): season_results_append(build_season_list(item))
 	season_results = []
 	season_results_append = season_results.append
-	threads = make_thread_list(_process, seasons_list)
+	threads = list(make_thread_list(_process, seasons_list))
 	[i.join() for i in threads]
 	return [i for i in season_results if i]
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 import sys
-from modules.metadata import tvshow_meta
-from modules.utils import get_datetime, get_current_timestamp, paginate_list, TaskPool, manual_function_import
+from modules.metadata import tvshow_meta, cached_meta_many, tvshow_meta_many
+from caches.meta_cache import meta_cache
+from modules.utils import get_datetime, get_current_timestamp, paginate_list, worker_pool, manual_function_import
 from modules import kodi_utils, settings, watched_status
 # logger = kodi_utils.logger
 
@@ -141,9 +142,9 @@ class TVShows:
 			if self.params_get('refreshed') == 'true': kodi_utils.sleep(1000)
 			kodi_utils.set_view_mode('view.tvshows', 'tvshows', self.is_external)
 
-	def build_tvshow_content(self, _position, _id):
+	def build_tvshow_content(self, _position, _id, meta=None):
 		try:
-			meta = tvshow_meta(self.id_type, _id, self.tmdb_api_key, self.mpaa_region, self.current_date, self.current_time, self.is_anime_list)
+			if meta is None: meta = tvshow_meta(self.id_type, _id, self.tmdb_api_key, self.mpaa_region, self.current_date, self.current_time, self.is_anime_list)
 			if not meta or 'blank_entry' in meta: return
 			cm = []
 			cm_append = cm.append
@@ -256,14 +257,22 @@ class TVShows:
 		self.watched_title = 'Trakt' if self.watched_indicators == 1 else 'FENLAM'
 		self.watched_info = watched_status.watched_info_tvshow(watched_status.get_database(self.watched_indicators))
 		self.window_command = 'ActivateWindow(Videos,%s,return)' if self.is_external else 'Container.Update(%s)'
-		if self.custom_order:
-			threads = TaskPool().tasks(self.build_tvshow_content, self.list, min(len(self.list), settings.max_threads()))
-			[i.join() for i in threads]
-		else:
-			threads = TaskPool().tasks_enumerate(self.build_tvshow_content, self.list, min(len(self.list), settings.max_threads()))
-			[i.join() for i in threads]
-			self.items.sort(key=lambda k: k[1])
-			self.items = [i[0] for i in self.items]
+		meta_cache.start_buffer()
+		try:
+			page = self.list if self.custom_order else list(enumerate(self.list, 1))
+			cached = cached_meta_many('tvshow', self.id_type, [i[1] for i in page], self.current_time, self.is_anime_list)
+			misses = []
+			for item, meta in zip(page, cached):
+				if meta is None: misses.append(item)
+				else: self.build_tvshow_content(*item, meta=meta)
+			if misses and self.id_type == 'tmdb_id' and settings.async_metadata():
+				metas = tvshow_meta_many(self.id_type, [i[1] for i in misses], self.tmdb_api_key, self.mpaa_region, self.current_date, self.current_time, self.is_anime_list)
+				misses = [(position, media_id, meta) for (position, media_id), meta in zip(misses, metas)]
+			worker_pool().starmap(self.build_tvshow_content, misses)
+			if not self.custom_order:
+				self.items.sort(key=lambda k: k[1])
+				self.items = [i[0] for i in self.items]
+		finally: meta_cache.flush_buffer()
 		return self.items
 
 	def sort_context_menu(self, context_menu_items):
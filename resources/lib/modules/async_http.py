@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+import ssl
+import json
+import zlib
+import asyncio
+from urllib.parse import urlsplit
+# from modules.kodi_utils import logger
+
+user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36'
+
+def fetch_json_many(urls, concurrency=20, timeout=20.0, limiter=None):
+	# GETs every url in one event loop and returns their decoded JSON in the same order, None for any that failed or did not answer 200 or 404.
+	# Each host gets up to concurrency HTTP/1.1 keep-alive connections, each working through the urls left for that host.
+	# A RequestLimiter, when given, paces every request and caps those in flight, shared with the session requests to the same service.
+	if not urls: return []
+	return asyncio.run(_fetch_all(urls, concurrency, timeout, limiter))
+
+def ssl_context():
+	try:
+		import certifi
+		return ssl.create_default_context(cafile=certifi.where())
+	except: return ssl.create_default_context()
+
+async def _fetch_all(urls, concurrency, timeout, limiter):
+	results, hosts, context = [None] * len(urls), {}, None
+	for position, url in enumerate(urls):
+		url = urlsplit(url)
+		path = '%s?%s' % (url.path or '/', url.query) if url.query else url.path or '/'
+		hosts.setdefault((url.scheme, url.hostname, url.port), []).append((position, path))
+	if any(i[0] == 'https' for i in hosts): context = ssl_context()
+	workers = []
+	for (scheme, host, port), paths in hosts.items():
+		queue = asyncio.Queue()
+		for item in paths: queue.put_nowait(item)
+		connection = (host, port or (443 if scheme == 'https' else 80), context if scheme == 'https' else None)
+		workers.extend(_worker(connection, queue, results, timeout, limiter) for i in range(min(concurrency, len(paths))))
+	await asyncio.gather(*workers)
+	return results
+
+async def _worker(connection, queue, results, timeout, limiter):
+	streams = None
+	try:
+		while not queue.empty():
+			position, path = queue.get_nowait()
+			for attempt in (0, 1):
+				if limiter: await _acquire(limiter)
+				status = None
+				try:
+					if streams is None: streams = await asyncio.wait_for(_connect(*connection), timeout)
+					body, keep_alive, status, headers = await asyncio.wait_for(_get(streams, connection[0], path), timeout)
+					# 404 bodies carry the status_code the metadata code turns into a blank entry. Anything else is left to the session path.
+					if status in (200, 404): results[position] = json.loads(body)
+					elif status == 429 and limiter: limiter.pause(_retry_after(headers))
+					if not keep_alive: streams = _close(streams)
+					break
+				except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, OSError):
+					# A keep-alive connection closed by the server is retried once on a new one.
+					streams = _close(streams)
+				except: break
+				finally:
+					if limiter: limiter.release(status)
+	finally: _close(streams)
+
+async def _acquire(limiter):
+	while True:
+		wait = limiter.try_acquire()
+		if wait == 0: return
+		await asyncio.sleep(0.05 if wait is None else wait)
+
+def _retry_after(headers, max_wait=30):
+	try: return min(max(float(headers.get('retry-after', 1)), 0), max_wait)
+	except ValueError: return 1
+
+async def _connect(host, port, context):
+	return await asyncio.open_connection(host, port, ssl=context, server_hostname=host if context else None)
+
+def _close(streams):
+	if streams is not None:
+		try: streams[1].close()
+		except: pass
+	return None
+
+async def _get(streams, host, path):
+	reader, writer = streams
+	writer.write(('GET %s HTTP/1.1\r\nHost: %s\r\nUser-Agent: %s\r\nAccept: application/json\r\nAccept-Encoding: gzip\r\nConnection: keep-alive\r\n\r\n'
+					% (path, host, user_agent)).encode('latin-1'))
+	await writer.drain()
+	status_line = await reader.readline()
+	if not status_line: raise ConnectionError('Connection closed')
+	version, status, headers = status_line.split(b' ', 1)[0], int(status_line.split(b' ', 2)[1]), {}
+	while True:
+		line = await reader.readline()
+		if line in (b'\r\n', b'\n', b''): break
+		key, value = line.decode('latin-1').split(':', 1)
+		headers[key.strip().lower()] = value.strip()
+	if headers.get('transfer-encoding', '').lower() == 'chunked':
+		body = []
+		while True:
+			size = int((await reader.readline()).split(b';', 1)[0], 16)
+			if size == 0:
+				while (await reader.readline()) not in (b'\r\n', b'\n', b''): pass
+				break
+			body.append(await reader.readexactly(size))
+			await reader.readexactly(2)
+		body = b''.join(body)
+	elif 'content-length' in headers: body = await reader.readexactly(int(headers['content-length']))
+	else:
+		body = await reader.read()
+		headers['connection'] = 'close'
+	if headers.get('content-encoding', '').lower() == 'gzip': body = zlib.decompress(body, 31)
+	keep_alive = headers.get('connection', '').lower() != 'close' and version != b'HTTP/1.0'
+	return body, keep_alive, status, headers
@@ -31,14 +31,15 @@ def manual_add_magnet_to_cloud(params):
 	else: notification('Success')
 
 def query_local_cache(hash_list):
-	return debrid_cache.get_many(hash_list) or []
+	return debrid_cache.get_many(hash_list) or {}
 
 def add_to_local_cache(hash_list, debrid, expires=24):
 	debrid_cache.set_many(hash_list, debrid, expires)
 
 def cached_check(hash_list, cached_hashes, debrid):
-	cached_list = [i[0] for i in cached_hashes if i[1] == debrid and i[2] == 'True']
-	unchecked_list = [i for i in hash_list if not any([h for h in cached_hashes if h[0] == i and h[1] == debrid])]
+	debrid_hashes = cached_hashes.get(debrid, {})
+	cached_list = [k for k, v in debrid_hashes.items() if v == 'True']
+	unchecked_list = [i for i in hash_list if not i in debrid_hashes]
 	return cached_list, unchecked_list
 
 def RD_check(hash_list, cached_hashes, data, active_debrid):
@@ -51,6 +52,7 @@ def RD_check(hash_list, cached_hashes, data, active_debrid):
 			process_list = []
 			process_append = process_list.append
 			try:
+				results = set(results)
 				for h in unchecked_hashes:
 					cached = 'False'
 					if h in results:
@@ -73,6 +75,7 @@ def AD_check(hash_list, cached_hashes, data, active_debrid):
 			process_list = []
 			process_append = process_list.append
 			try:
+				results = set(results)
 				for h in unchecked_hashes:
 					cached = 'False'
 					if h in results:
@@ -120,7 +123,7 @@ def OC_check(hash_list, cached_hashes):
 			process_list = []
 			process_append = process_list.append
 			try:
-				results = results['cachedItems']
+				results = set(results['cachedItems'])
 				for h in unchecked_hashes:
 					cached = 'False'
 					if h in results:
@@ -168,7 +171,7 @@ def TB_check(hash_list, cached_hashes):
 			process_append = process_list.append
 			try:
 				data = results['data']
-				results = [i['hash'] for i in data]
+				results = set(i['hash'] for i in data)
 				for h in unchecked_hashes:
 					cached = 'False'
 					if h in results:
@@ -2,7 +2,10 @@
 # TRUMP WON
 import xbmc, xbmcgui, xbmcplugin, xbmcvfs, xbmcaddon
 import os
-from urllib.parse import urlencode, unquote
+from time import monotonic
+from random import uniform
+from threading import Lock, Condition, local
+from urllib.parse import urlencode, unquote, urlparse
 
 def random_valid_type_check():
 	return {'build_movie_list': 'movie', 'build_tvshow_list': 'tvshow', 'build_season_list': 'season', 'build_episode_list': 'episode',
@@ -182,11 +185,151 @@ def container_content():
 def set_sort_method(handle, method):
 	xbmcplugin.addSortMethod(handle, {'episodes': 24, 'files': 5, 'label': 2, 'none': 0}[method])
 
+sessions, sessions_lock = {}, Lock()
+
+class ConditionalRequests(local):
+	# Per thread stack of cache revalidations. The first GET made through a pooled session while one is open sends its validators
+	# and records whether the server answered 304, along with any new validators. Nested revalidations each claim their own first GET.
+	def __init__(self):
+		self.stack = []
+
+	def push(self, validators):
+		context = {'validators': validators or {}, 'claimed': False, 'not_modified': False, 'response_validators': {}}
+		self.stack.append(context)
+		return context
+
+	def pop(self):
+		return self.stack.pop()
+
+	def claim(self, method):
+		if not self.stack or method.upper() != 'GET': return None
+		context = self.stack[-1]
+		if context['claimed']: return None
+		context['claimed'] = True
+		return context
+
+conditional_requests = ConditionalRequests()
+
+def conditional_request(request):
+	def _request(method, url, **kwargs):
+		context = conditional_requests.claim(method)
+		if context is None: return request(method, url, **kwargs)
+		validators = context['validators']
+		headers = dict(kwargs.get('headers') or {})
+		if validators.get('etag'): headers['If-None-Match'] = validators['etag']
+		if validators.get('last_modified'): headers['If-Modified-Since'] = validators['last_modified']
+		kwargs['headers'] = headers
+		response = request(method, url, **kwargs)
+		context['not_modified'] = bool(validators) and response.status_code == 304
+		context['response_validators'] = dict((k, v) for k, v in (('etag', response.headers.get('ETag')), ('last_modified', response.headers.get('Last-Modified'))) if v)
+		return response
+	return _request
+
+class RequestLimiter:
+	# Token bucket for a service's rate limit, shared by every thread, plus an adaptive cap on requests in flight.
+	# The cap halves on a 429 or 5xx and grows back by one after as many successes as the current cap. A 429 also pauses every
+	# caller and cuts the rate by a quarter, which then creeps back up by 1% of the full rate per success.
+	def __init__(self, rate, burst, max_in_flight):
+		self.rate, self.max_rate, self.burst, self.max_in_flight = rate, rate, burst, max_in_flight
+		self.tokens, self.updated, self.paused_until = burst, monotonic(), 0
+		self.limit, self.in_flight, self.successes = max_in_flight, 0, 0
+		self.condition = Condition()
+
+	def acquire(self):
+		with self.condition:
+			while True:
+				wait = self._take()
+				if wait == 0: return
+				self.condition.wait(wait)
+
+	def try_acquire(self):
+		# For callers that must not block, such as an event loop. Returns 0 once acquired, otherwise the seconds to wait, or None while
+		# the cap on requests in flight is reached.
+		with self.condition: return self._take()
+
+	def _take(self):
+		now = monotonic()
+		self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+		wait = self.paused_until - now
+		if wait > 0: return wait
+		if self.in_flight >= self.limit: return None
+		if self.tokens >= 1:
+			self.tokens -= 1
+			self.in_flight += 1
+			return 0
+		return (1 - self.tokens) / self.rate
+
+	def release(self, status_code):
+		with self.condition:
+			self.in_flight -= 1
+			if status_code is None: pass
+			elif status_code == 429 or status_code >= 500:
+				self.limit, self.successes = max(1, self.limit // 2), 0
+				if status_code == 429: self.rate = max(self.max_rate * 0.05, self.rate * 0.75)
+			else:
+				self.rate = min(self.max_rate, self.rate + self.max_rate * 0.01)
+				if self.limit < self.max_in_flight:
+					self.successes += 1
+					if self.successes >= self.limit: self.limit, self.successes = self.limit + 1, 0
+			self.condition.notify_all()
+
+	def pause(self, seconds):
+		with self.condition: self.paused_until = max(self.paused_until, monotonic() + seconds)
+
+def retry_after(response):
+	value = response.headers.get('Retry-After')
+	if not value: return None
+	try: return max(float(value), 0)
+	except ValueError: pass
+	try:
+		from email.utils import parsedate_to_datetime
+		from datetime import datetime, timezone
+		return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+	except: return None
+
+def limited_request(request, read_limiter, write_limiter, retries=3, max_wait=30):
+	# A 429 is retried after its Retry-After time, or a jittered exponential backoff without one. Waits over max_wait hand the 429 back.
+	def _request(method, url, **kwargs):
+		limiter = read_limiter if method.upper() in ('GET', 'HEAD') else write_limiter
+		for attempt in range(retries + 1):
+			limiter.acquire()
+			status_code = None
+			try:
+				response = request(method, url, **kwargs)
+				status_code = response.status_code
+			finally: limiter.release(status_code)
+			if status_code != 429 or attempt == retries: return response
+			wait = retry_after(response)
+			if wait is None: wait = uniform(0, 2 ** attempt)
+			elif wait > max_wait: return response
+			limiter.pause(wait + uniform(0, 0.5))
+		return response
+	return _request
+
+# Trakt allows 1000 GETs per 5 minutes and 1 write per second. TMDb allows around 50 requests per second.
+request_limiters = {'api.themoviedb.org': (RequestLimiter(40, 40, 20), None), 'api.trakt.tv': (RequestLimiter(1000 / 300.0, 100, 6), RequestLimiter(1, 1, 2))}
+
 def make_session(url='https://'):
-	import requests
-	session = requests.Session()
-	session.mount(url, requests.adapters.HTTPAdapter(pool_maxsize=100))
-	return session	
+	# One pooled session per host, shared by every module and thread calling it, so keep-alive connections and TLS sessions are reused.
+	# Connection errors are retried for any method, 502/503/504 only for idempotent ones. requests already asks for gzip.
+	host = urlparse(url).netloc
+	with sessions_lock:
+		session = sessions.get(host)
+		if session is None:
+			import requests
+			from urllib3.util.retry import Retry
+			retries = Retry(total=2, connect=2, read=1, status=2, backoff_factor=0.3, status_forcelist=(502, 503, 504), raise_on_status=False)
+			adapter = requests.adapters.HTTPAdapter(pool_connections=10, pool_maxsize=100, max_retries=retries)
+			session = requests.Session()
+			session.mount('https://', adapter)
+			session.mount('http://', adapter)
+			if host in request_limiters:
+				read_limiter, write_limiter = request_limiters[host]
+				session.request = limited_request(session.request, read_limiter, write_limiter or read_limiter)
+			session.request = conditional_request(session.request)
+			sessions[host] = session
+	return session
 
 def make_playlist(playlist_type='video'):
 	return xbmc.PlayList({'music': 0, 'video': 1}[playlist_type])
@@ -1,9 +1,11 @@
 # -*- coding: utf-8 -*-
 from operator import itemgetter
+from caches.base_cache import single_flight
 from caches.meta_cache import meta_cache
 from apis.tmdb_api import movie_details, tvshow_details, season_episodes_details, movie_set_details, movie_external_id, tvshow_external_id, \
-								episode_groups_data, episode_group_details
-from modules.utils import jsondate_to_datetime, subtract_dates
+								episode_groups_data, episode_group_details, movie_details_many, tvshow_details_many, season_episodes_details_many
+from modules.settings import async_metadata
+from modules.utils import jsondate_to_datetime, subtract_dates, worker_pool
 # from modules.kodi_utils import logger
 
 def movie_meta(id_type, media_id, api_key, mpaa_region, current_date, current_time=None):
@@ -14,8 +16,20 @@ def movie_meta(id_type, media_id, api_key, mpaa_region, current_date, current_ti
 	if media_id == None: return None
 	meta = meta_cache.get('movie', id_type, media_id, current_time)
 	if meta: return meta
+	return single_flight.do(('movie', id_type, str(media_id)), fetch_movie_meta, id_type, media_id, api_key, mpaa_region, current_date, current_time)
+
+def movie_meta_many(id_type, media_ids, api_key, mpaa_region, current_date, current_time=None):
+	# Details for a page of cache misses fetched in one event loop. Only tmdb and imdb ids can be batched. Anything the batch missed is returned
+	# as None, for the caller to fetch through movie_meta on its worker pool.
+	if id_type in ('tmdb_id', 'imdb_id'): details = movie_details_many(media_ids, api_key)
+	else: details = [None for i in media_ids]
+	return [fetch_movie_meta(id_type, media_id, api_key, mpaa_region, current_date, current_time, data) if data else None for media_id, data in zip(media_ids, details)]
+
+def fetch_movie_meta(id_type, media_id, api_key, mpaa_region, current_date, current_time, data=None):
+	meta = None
 	try:
-		if id_type in ('tmdb_id', 'imdb_id'): data = movie_details(media_id, api_key)
+		if data: pass
+		elif id_type in ('tmdb_id', 'imdb_id'): data = movie_details(media_id, api_key)
 		else:
 			external_result = movie_external_id(id_type, media_id, api_key)
 			if not external_result: data = None
@@ -150,8 +164,30 @@ def tvshow_meta(id_type, media_id, api_key, mpaa_region, current_date, current_t
 	if media_id == None: return None
 	meta = meta_cache.get('tvshow', id_type, media_id, current_time)
 	if meta: return meta_valid_check(meta, is_anime_list)
+	meta = single_flight.do(('tvshow', id_type, str(media_id)), fetch_tvshow_meta, id_type, media_id, api_key, mpaa_region, current_date, current_time)
+	if meta and meta.get('blank_entry'): return meta
+	return meta_valid_check(meta, is_anime_list)
+
+def tvshow_meta_many(id_type, media_ids, api_key, mpaa_region, current_date, current_time=None, is_anime_list=None):
+	# As movie_meta_many, for tmdb ids only.
+	if id_type == 'tmdb_id': details = tvshow_details_many(media_ids, api_key)
+	else: details = [None for i in media_ids]
+	results = []
+	results_append = results.append
+	for media_id, data in zip(media_ids, details):
+		if not data:
+			results_append(None)
+			continue
+		meta = fetch_tvshow_meta(id_type, media_id, api_key, mpaa_region, current_date, current_time, data)
+		if meta and meta.get('blank_entry'): results_append(meta)
+		else: results_append(meta_valid_check(meta, is_anime_list))
+	return results
+
+def fetch_tvshow_meta(id_type, media_id, api_key, mpaa_region, current_date, current_time, data=None):
+	meta = None
 	try:
-		if id_type == 'tmdb_id': data = tvshow_details(media_id, api_key)
+		if data: pass
+		elif id_type == 'tmdb_id': data = tvshow_details(media_id, api_key)
 		else:
 			external_result = tvshow_external_id(id_type, media_id, api_key)
 			if not external_result: data = None
@@ -278,7 +314,7 @@ def tvshow_meta(id_type, media_id, api_key, mpaa_region, current_date, current_t
 				'landscape': landscape, 'keywords': keywords, 'rpdb_poster': rpdb_poster, 'short_cast': short_cast}
 		meta_cache.set('tvshow', id_type, meta, tvshow_expiry(current_date, meta), current_time)
 	except: pass
-	return meta_valid_check(meta, is_anime_list)
+	return meta
 
 def movieset_meta(media_id, api_key, current_time=None):
 	if media_id == None: return None
@@ -307,7 +343,7 @@ def movieset_meta(media_id, api_key, current_time=None):
 	except: pass
 	return meta
 
-def episodes_meta(season, meta):
+def episodes_meta(season, meta, season_details=None):
 	def _process():
 		midseason_premiere = False
 		for ep_data in details:
@@ -358,7 +394,7 @@ def episodes_meta(season, meta):
 		if tvshow_status in ('Ended', 'Canceled') or total_seasons > int(season): expiration = 4368
 		else: expiration = 96
 		try:
-			details = season_episodes_details(media_id, season)['episodes']
+			details = (season_details or season_episodes_details(media_id, season))['episodes']
 			total_episodes = len(details)
 			data = list(_process())
 		except: data, expiration = [], 96
@@ -367,7 +403,6 @@ def episodes_meta(season, meta):
 	return data
 
 def all_episodes_meta(meta, include_specials=False):
-	from threading import Thread
 	def _get_tmdb_episodes(season):
 		try: data.extend(episodes_meta(season, meta))
 		except: pass
@@ -376,9 +411,16 @@ def all_episodes_meta(meta, include_specials=False):
 		season_data = meta['season_data']
 		seasons = [i['season_number'] for i in season_data]
 		if not include_specials: seasons = [i for i in seasons if not i == 0]
-		threads = [Thread(target=_get_tmdb_episodes, args=(i,)) for i in seasons]
-		[i.start() for i in threads]
-		[i.join() for i in threads]
+		if async_metadata():
+			media_id = meta['tmdb_id']
+			misses = [i for i in seasons if meta_cache.get_season('%s_%s' % (media_id, i)) is None]
+			season_details = dict(zip(misses, season_episodes_details_many(media_id, misses)))
+			failed = [i for i in misses if not season_details[i]]
+			for i in seasons:
+				if not i in failed: data.extend(episodes_meta(i, meta, season_details.get(i)))
+			# Seasons the batch missed are fetched on the worker pool, as without async metadata.
+			worker_pool().map(_get_tmdb_episodes, failed)
+		else: worker_pool().map(_get_tmdb_episodes, seasons)
 	except: pass
 	return data
 
@@ -425,6 +467,19 @@ def tvshow_expiry(current_date, meta):
 	except: expiration = 96
 	return expiration
 
+def cached_meta_many(media_type, id_type, media_ids, current_time=None, is_anime_list=None):
+	# Cache only lookup for a whole page of ids. Returns a list in media_ids order holding each cached meta, or None for a miss.
+	id_keys = {'movie': (('tmdb', 'tmdb_id'), ('imdb', 'imdb_id')), 'tvshow': (('tmdb', 'tmdb_id'), ('imdb', 'imdb_id'), ('tvdb', 'tvdb_id'))}[media_type]
+	if id_type == 'trakt_dict': resolved = [next(((v, i[k]) for k, v in id_keys if i.get(k, None)), (None, None)) for i in media_ids]
+	else: resolved = [(id_type, i) for i in media_ids]
+	cached = dict((i, meta_cache.get_many(media_type, i, [x[1] for x in resolved if x[0] == i], current_time)) for i in set(x[0] for x in resolved if x[0]))
+	results = []
+	for _id_type, media_id in resolved:
+		meta = cached.get(_id_type, {}).get(str(media_id))
+		if meta is not None and media_type == 'tvshow': meta = meta_valid_check(meta, is_anime_list)
+		results.append(meta)
+	return results
+
 def meta_valid_check(meta, is_anime_list):
 	if is_anime_list == None: return meta
 	if is_anime_check(meta) != is_anime_list: meta = {}
@@ -4,7 +4,7 @@ import json
 from threading import Thread
 from apis.trakt_api import make_trakt_slug
 from caches.settings_cache import get_setting
-from modules import kodi_utils as ku, settings as st, watched_status as ws
+from modules import kodi_utils as ku, settings as st, timings, watched_status as ws
 from apis.jellyfin_api import JellyfinAPI
 
 logger = ku.logger
@@ -23,10 +23,14 @@ class FenLightPlayer(xbmc.Player):
 	def play_video(self, url, obj):
 		self.set_constants(url, obj)
 		ku.volume_checker()
-		self.play(self.url, self.make_listing())
+		with timings.span('playback_start'):
+			self.play(self.url, self.make_listing())
+			if not self.is_generic: self.check_playback_start()
 		if not self.is_generic:
-			self.check_playback_start()
-			if self.playback_successful: self.monitor()
+			# The request is timed up to the start of playback, as monitor() only returns once playback has ended.
+			if self.playback_successful:
+				timings.finish(timings.current, result='playing')
+				self.monitor()
 			else:
 				self.sources_object.playback_successful = self.playback_successful
 				self.sources_object.cancel_all_playback = self.cancel_all_playback
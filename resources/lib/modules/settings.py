@@ -119,6 +119,9 @@ def include_prerelease_results():
 def auto_enable_subs():
 	return get_setting('fenlight.playback.auto_enable_subs', 'false') == 'true'
 
+def playback_timings():
+	return get_setting('fenlight.playback.timings', 'false') == 'true'
+
 def stingers_show():
 	return get_setting('fenlight.stinger_alert.show', 'false') == 'true'
 
@@ -134,6 +137,9 @@ def include_anime_tvshow():
 def auto_play(media_type):
 	return get_setting('fenlight.auto_play_%s' % media_type, 'false') == 'true'
 
+def early_autoplay(media_type):
+	return get_setting('fenlight.early_autoplay_%s' % media_type, 'false') == 'true'
+
 def autoplay_next_episode():
 	if auto_play('episode') and get_setting('fenlight.autoplay_next_episode', 'false') == 'true': return True
 	else: return False
@@ -357,6 +363,9 @@ def max_threads():
 	if not get_setting('fenlight.limit_concurrent_threads', 'false') == 'true': return 60
 	return int(get_setting('fenlight.max_threads', '60'))
 
+def async_metadata():
+	return get_setting('fenlight.async_metadata', 'false') == 'true'
+
 def get_meta_filter():
 	return get_setting('fenlight.meta_filter', 'true')
 
@@ -366,6 +375,9 @@ def mpaa_region():
 def widget_hide_next_page():
 	return get_setting('fenlight.widget_hide_next_page', 'false') == 'true'
 
+def widget_stale_while_revalidate():
+	return get_setting('fenlight.widget_stale_while_revalidate', 'true') == 'true'
+
 def widget_hide_watched():
 	return get_setting('fenlight.widget_hide_watched', 'false') == 'true'
 
@@ -3,14 +3,15 @@ import re
 import json
 import base64
 import time
-import requests
-from threading import Thread
+from threading import Condition, Lock
+from collections import Counter
+from functools import lru_cache
 from urllib.parse import unquote, unquote_plus
 from caches.settings_cache import get_setting
 from modules.metadata import episodes_meta
 from modules.settings import date_offset
-from modules.kodi_utils import supported_media, get_property, set_property, notification
-from modules.utils import adjust_premiered_date, get_datetime, jsondate_to_datetime, subtract_dates, chunks
+from modules.kodi_utils import make_session, supported_media, get_property, notification
+from modules.utils import adjust_premiered_date, get_datetime, jsondate_to_datetime, subtract_dates, chunks, worker_pool
 # from modules.kodi_utils import logger
 
 def extras():
@@ -60,8 +61,88 @@ def make_alias_dict(meta, title):
 	if country_codes: aliases.extend([{'title': '%s %s' % (title, i), 'country': ''} for i in country_codes])
 	return aliases
 
+class ResultBus:
+	# Internal scrapers run in the same process as the dialogs reading their results, so the lists are handed over directly.
+	# Readers wait on the condition for the next publish instead of polling, and each result is collected once.
+	def __init__(self):
+		self.changed, self.results, self.version = Condition(), {}, 0
+
+	def publish(self, provider, sources):
+		with self.changed:
+			self.results[provider] = sources
+			self.version += 1
+			self.changed.notify_all()
+
+	def notify(self):
+		with self.changed:
+			self.version += 1
+			self.changed.notify_all()
+
+	def collect(self, providers):
+		with self.changed: return [(i, self.results.pop(i)) for i in providers if i in self.results]
+
+	def wait(self, version, timeout):
+		# Returns the current version, at once if it has moved past version, otherwise after the next publish or the timeout.
+		with self.changed:
+			if self.version == version: self.changed.wait(timeout)
+			return self.version
+
+	def clear(self, providers):
+		with self.changed:
+			for i in providers: self.results.pop(i, None)
+
+result_bus = ResultBus()
+
+class ScrapeProgress:
+	# Quality counts and running providers shown by a scraper progress dialog. The scraper threads keep them up to date as results
+	# arrive and providers finish, and wake the dialog through result_bus, so a dialog update only reads them.
+	refresh_time = 0.1
+
+	def __init__(self):
+		self.lock = Lock()
+		self.counts, self.total = {'4K': 0, '1080p': 0, '720p': 0, 'SD': 0}, 0
+		self.running, self.line = {}, ''
+
+	def add(self, sources):
+		if not sources: return
+		counts = Counter(i['quality'] for i in sources)
+		with self.lock:
+			for quality, count in counts.items():
+				if quality in ('CAM', 'TELE', 'SYNC'): quality = 'SD'
+				if quality in self.counts: self.counts[quality] += count
+			self.total += len(sources)
+		result_bus.notify()
+
+	def start(self, name):
+		# Called before the provider's work is submitted, so it can never finish before it is counted.
+		with self.lock:
+			self.running[name] = self.running.get(name, 0) + 1
+			self.line = ', '.join(self.running).upper()
+
+	def finish(self, name):
+		with self.lock:
+			count = self.running.pop(name, 0) - 1
+			if count > 0: self.running[name] = count
+			self.line = ', '.join(self.running).upper()
+		result_bus.notify()
+
+	def run(self, name, function, *args):
+		try: return function(*args)
+		finally: self.finish(name)
+
+	def remaining(self):
+		return len(self.running)
+
+	def status(self):
+		# Arguments for update_scraper, without the percent.
+		with self.lock: return self.counts['SD'], self.counts['720p'], self.counts['1080p'], self.counts['4K'], self.total, self.line
+
+	def wait(self, version, end_time):
+		# Wakes on the next change or after refresh_time, which keeps the progress bar moving, but never later than end_time.
+		return result_bus.wait(version, max(min(self.refresh_time, end_time - time.time()), 0))
+
 def internal_results(provider, sources):
-	set_property('fenlight.internal_results.%s' % provider, json.dumps(sources))
+	result_bus.publish(provider, sources)
 
 def normalize(title):
 	import unicodedata
@@ -91,11 +172,18 @@ def supported_video_extensions():
 	supported_video_extensions = supported_media().split('|')
 	return [i for i in supported_video_extensions if not i in ('','.zip','.rar','.iso')]
 
-def seas_ep_filter(season, episode, release_title, split=False, return_match=False):
+release_title_clean = re.compile(r'[^A-Za-z0-9-]+')
+season_in_release_regex = tuple(re.compile(i) for i in (r's(\d+)', r's\.(\d+)', r'(\d+)x', r'(\d+)\.x', r'season(\d+)', r'season\.(\d+)'))
+
+def normalize_release_title(release_title):
+	return release_title_clean.sub('.', unquote(release_title).replace('\'', '')).lower()
+
+@lru_cache(maxsize=64)
+def seas_ep_pattern(season, episode):
+	# Compiled once per season/episode pair and reused for every file and release checked during a scrape.
 	str_season, str_episode = str(season), str(episode)
 	season_fill, episode_fill = str_season.zfill(2), str_episode.zfill(2)
 	str_ep_plus_1, str_ep_minus_1 = str(episode+1), str(episode-1)
-	release_title = re.sub(r'[^A-Za-z0-9-]+', '.', unquote(release_title).replace('\'', '')).lower()
 	string1 = r'(s<<S>>[.-]?e[p]?[.-]?<<E>>[.-])'
 	string2 = r'(season[.-]?<<S>>[.-]?episode[.-]?<<E>>[.-])'#|([s]?<<S>>[x.]<<E>>[.-])'
 	string3 = r'(s<<S>>e<<E1>>[.-]?e?<<E2>>[.-])'
@@ -126,19 +214,21 @@ def seas_ep_filter(season, episode, release_title, split=False, return_match=Fal
 	string_list_append(string8.replace('<<S>>', str_season).replace('<<E>>', episode_fill))
 	string_list_append(string8.replace('<<S>>', season_fill).replace('<<E>>', str_episode))
 	string_list_append(string8.replace('<<S>>', str_season).replace('<<E>>', str_episode))
-	final_string = '|'.join(string_list)
-	reg_pattern = re.compile(final_string)
-	if split: return release_title.split(re.search(reg_pattern, release_title).group(), 1)[1]
-	if return_match: return re.search(reg_pattern, release_title).group()
-	return bool(re.search(reg_pattern, release_title))
+	return re.compile('|'.join(string_list))
+
+def seas_ep_filter(season, episode, release_title, split=False, return_match=False):
+	release_title = normalize_release_title(release_title)
+	match = seas_ep_pattern(season, episode).search(release_title)
+	if split: return release_title.split(match.group(), 1)[1]
+	if return_match: return match.group()
+	return bool(match)
 
 def find_season_in_release_title(release_title):
-	release_title = re.sub(r'[^A-Za-z0-9-]+', '.', unquote(release_title).replace('\'', '')).lower()
+	release_title = normalize_release_title(release_title)
 	match = None
-	regex_list = [r's(\d+)', r's\.(\d+)', r'(\d+)x', r'(\d+)\.x', r'season(\d+)', r'season\.(\d+)']
-	for item in regex_list:
+	for item in season_in_release_regex:
 		try:
-			match = re.search(item, release_title)
+			match = item.search(release_title)
 			if match:
 				match = int(str(match.group(1)).lstrip('0'))
 				break
@@ -225,129 +315,162 @@ def get_file_info(name_info=None, url=None, default_quality='SD'):
 	if name_info: title = name_info
 	elif url: title = url_strip(url)
 	if not title: return 'SD', ''
-	quality = get_release_quality(title) or default_quality
-	info = get_info(title)
-	return quality, info
+	quality, info, flags = parse_release_info(title)
+	return quality or default_quality, info
 
-def get_release_quality(release_info):
-	if any(i in release_info for i in ('.scr.', 'screener', 'dvdscr', 'dvd.scr', '.r5', '.r6')):
-		return 'SCR'
-	if any(i in release_info for i in ('.cam.', 'camrip', 'hdcam', '.hd.cam', 'hqcam', '.hq.cam', 'cam.rip', 'dvdcam')):
-		return 'CAM'
-	if any(i in release_info for i in ('.tc.', '.ts.', 'tsrip', 'hdts', 'hdtc', '.hd.tc', 'dvdts', 'telesync', 'tele.sync', 'telecine', 'tele.cine')):
-		return 'TELE'
-	if any(i in release_info for i in ('720', '720p', '720i', 'hd720', '720hd', 'hd720p', '72o', '72op')):
-		return '720p'
-	if any(i in release_info for i in ('1080', '1080p', '1080i', 'hd1080', '1080hd', 'hd1080p', 'm1080p', 'fullhd', 'full.hd', '1o8o', '1o8op', '108o', '108op', '1o80', '1o80p')):
-		return '1080p'
-	if any(i in release_info for i in ('.4k', 'hd4k', '4khd', '.uhd', 'ultrahd', 'ultra.hd', 'hd2160', '2160hd', '2160', '2160p', '216o', '216op')):
-		return '4K'
-	return None
+release_quality_groups = (('scr', 'SCR'), ('cam', 'CAM'), ('tele', 'TELE'), ('720p', '720p'), ('1080p', '1080p'), ('4k', '4K'))
 
-def get_info(title):
-	# thanks 123Venom and gaiaaaiaai, whom I knicked most of this code from. :)
+release_info_needles = (
+('scr', ('.scr.', 'screener', 'dvdscr', 'dvd.scr', '.r5', '.r6')),
+('cam', ('.cam.', 'camrip', 'hdcam', '.hd.cam', 'hqcam', '.hq.cam', 'cam.rip', 'dvdcam')),
+('tele', ('.tc.', '.ts.', 'tsrip', 'hdts', 'hdtc', '.hd.tc', 'dvdts', 'telesync', 'tele.sync', 'telecine', 'tele.cine')),
+('720p', ('720', '720p', '720i', 'hd720', '720hd', 'hd720p', '72o', '72op')),
+('1080p', ('1080', '1080p', '1080i', 'hd1080', '1080hd', 'hd1080p', 'm1080p', 'fullhd', 'full.hd', '1o8o', '1o8op', '108o', '108op', '1o80', '1o80p')),
+('4k', ('.4k', 'hd4k', '4khd', '.uhd', 'ultrahd', 'ultra.hd', 'hd2160', '2160hd', '2160', '2160p', '216o', '216op')),
+('3d', ('.3d.', '.sbs.', '.hsbs', 'sidebyside', 'side.by.side', 'stereoscopic', '.tab.', '.htab.', 'topandbottom', 'top.and.bottom')),
+('sdr', ('.sdr',)),
+('dv', ('dolby.vision', 'dolbyvision', '.dovi.', '.dv.')),
+('hdr', ('2160p.bluray.hevc.truehd', '2160p.bluray.hevc.dts', '2160p.bluray.hevc.lpcm', '2160p.blu.ray.hevc.truehd', '2160p.blu.ray.hevc.dts',
+	'2160p.uhd.bluray', '2160p.uhd.blu.ray', '2160p.us.bluray.hevc.truehd', '2160p.us.bluray.hevc.dts', '.hdr.', 'hdr10', 'hdr.10', 'uhd.bluray.2160p', 'uhd.blu.ray.2160p')),
+('2160p', ('2160p',)),
+('dv_hdr', ('.hdr.', '.hdr10.', 'hdr.10', 'hybrid')),
+('avc', ('avc', 'h264', 'h.264', 'x264', 'x.264')),
+('av1', ('.av1.',)),
+('hevc', ('h265', 'h.265', 'hevc', 'x265', 'x.265')),
+('imax', ('.imax.', '.(imax).', '.(.imax.).')),
+('enhanced', ('.enhanced.', '.upscaled.', '.enhance.', '.upscale.')),
+('atvp', ('.atvp',)),
+('xvid', ('xvid', '.x.vid')),
+('divx', ('divx', 'div2', 'div3', 'div4')),
+('remux', ('remux', 'bdremux')),
+('bluray', ('bluray', 'blu.ray', 'bdrip', 'bd.rip')),
+('dvd', ('dvdrip', 'dvd.rip')),
+('web', ('.web.', 'webdl', 'web.dl', 'web-dl', 'webrip', 'web.rip')),
+('hdtv', ('hdtv',)),
+('pdtv', ('pdtv',)),
+('hdrip', ('.hdrip', '.hd.rip')),
+('atmos', ('atmos',)),
+('truehd', ('true.hd', 'truehd')),
+('ddp', ('dolby.digital.plus', 'dolbydigital.plus', 'dolbydigitalplus', 'dd.plus.', 'ddplus', '.ddp.', 'ddp2', 'ddp5', 'ddp7', 'eac3', '.e.ac3')),
+('ddex', ('.dd.ex.', 'ddex', 'dolby.ex.', 'dolby.digital.ex.', 'dolbydigital.ex.')),
+('dd', ('dd2.', 'dd5', 'dd7', 'dolby.digital', 'dolbydigital', '.ac3', '.ac.3.', '.dd.')),
+('aac', ('aac',)),
+('mp3', ('mp3',)),
+('flac', ('.flac.',)),
+('opus', ('opus',)),
+('dtsx', ('.dts.x.', 'dtsx')),
+('dtshdma', ('hd.ma', 'hdma')),
+('dtshd', ('dts.hd.', 'dtshd')),
+('dts', ('.dts',)),
+('8ch', ('ch8.', '8ch.', '7.1ch', '7.1.')),
+('7ch', ('ch7.', '7ch.', '6.1ch', '6.1.')),
+('6ch', ('ch6.', '6ch.', '5.1ch', '5.1.')),
+('2ch', ('ch2', '2ch', '2.0ch', '2.0.', 'audio.2.0.', 'stereo')),
+('wmv', ('.wmv',)),
+('mpeg', ('.mpg', '.mp2', '.mpeg', '.mpe', '.mpv', '.mp4', '.m4p', '.m4v', 'msmpeg', 'mpegurl')),
+('avi', ('.avi',)),
+('mkv', ('.mkv', 'matroska')),
+('multi', ('hindi.eng', 'ara.eng', 'ces.eng', 'chi.eng', 'cze.eng', 'dan.eng', 'dut.eng', 'ell.eng', 'esl.eng', 'esp.eng', 'fin.eng', 'fra.eng', 'fre.eng',
+	'frn.eng', 'gai.eng', 'ger.eng', 'gle.eng', 'gre.eng', 'gtm.eng', 'heb.eng', 'hin.eng', 'hun.eng', 'ind.eng', 'iri.eng', 'ita.eng', 'jap.eng', 'jpn.eng', 'kor.eng',
+	'lat.eng', 'lebb.eng', 'lit.eng', 'nor.eng', 'pol.eng', 'por.eng', 'rus.eng', 'som.eng', 'spa.eng', 'sve.eng', 'swe.eng', 'tha.eng', 'tur.eng', 'uae.eng', 'ukr.eng',
+	'vie.eng', 'zho.eng', 'dual.audio', 'multi')),
+('ads', ('1xbet', 'betwin')),
+('subs', ('subita', 'subfrench', 'subspanish', 'subtitula', 'swesub', 'nl.subs', 'subbed')))
+
+release_info_tokens = ('[B]3D[/B]', 'SDR', '[B]D/VISION[/B]', '[B]HDR[/B]', '[B]HYBRID[/B]', 'AVC', '[B]AV1[/B]', '[B]HEVC[/B]', 'IMAX', '[B]AI ENHANCED/UPSCALED[/B]',
+'APPLETV+', 'XVID', 'DIVX', 'REMUX', 'BLURAY', 'DVD', 'WEB', 'HDTV', 'PDTV', 'HDRIP', 'ATMOS', 'TRUEHD', 'DD+', 'DD-EX', 'DD', 'AAC', 'MP3', 'FLAC', 'OPUS',
+'DTS-X', 'DTS-HD MA', 'DTS-HD', 'DTS', '8CH', '7CH', '6CH', '2CH', 'WMV', 'MPEG', 'AVI', 'MKV', 'MULTI-LANG', 'ADS', 'SUBS')
+release_info_bits = {token: 1 << count for count, token in enumerate(release_info_tokens)}
+
+def trie_pattern(words):
+	trie = {}
+	for word in words:
+		node = trie
+		for char in word: node = node.setdefault(char, {})
+		node[''] = True
+	def _pattern(node):
+		branches = [re.escape(char) + _pattern(child) for char, child in sorted(node.items()) if char]
+		if not branches: return ''
+		pattern = branches[0] if len(branches) == 1 else '(?:%s)' % '|'.join(branches)
+		if '' in node: pattern = '(?:%s)?' % pattern
+		return pattern
+	return _pattern(trie)
+
+@lru_cache(maxsize=None)
+def release_info_matcher():
+	# Every needle above in one trie shaped pattern, matching the longest needle at each position. A hit also counts the needles
+	# it contains, so the groups found are exactly those the old per-tag substring checks would have found.
+	needle_groups = {}
+	for group, needles in release_info_needles:
+		for needle in needles: needle_groups.setdefault(needle, set()).add(group)
+	contained = dict((i, frozenset().union(*[groups for x, groups in needle_groups.items() if x in i])) for i in needle_groups)
+	return re.compile('(?=(%s))' % trie_pattern(needle_groups)), contained
+
+@lru_cache(maxsize=4096)
+def parse_release_info(title):
+	# thanks 123Venom and gaiaaaiaai, whom I knicked most of the original checks from. :)
+	pattern, contained = release_info_matcher()
+	found = set()
+	for i in pattern.findall(title): found.update(contained[i])
+	quality = next((q for group, q in release_quality_groups if group in found), None)
 	info = []
 	info_append = info.append
-	if any(i in title for i in ('.3d.', '.sbs.', '.hsbs', 'sidebyside', 'side.by.side', 'stereoscopic', '.tab.', '.htab.', 'topandbottom', 'top.and.bottom')):
-		info_append('[B]3D[/B]')
-	if '.sdr' in title:
-		info_append('SDR')
-	elif any(i in title for i in ('dolby.vision', 'dolbyvision', '.dovi.', '.dv.')):
-		info_append('[B]D/VISION[/B]')
-	elif any(i in title for i in ('2160p.bluray.hevc.truehd', '2160p.bluray.hevc.dts', '2160p.bluray.hevc.lpcm', '2160p.blu.ray.hevc.truehd', '2160p.blu.ray.hevc.dts',
-		'2160p.uhd.bluray', '2160p.uhd.blu.ray', '2160p.us.bluray.hevc.truehd', '2160p.us.bluray.hevc.dts', '.hdr.', 'hdr10', 'hdr.10', 'uhd.bluray.2160p', 'uhd.blu.ray.2160p')):
-		info_append('[B]HDR[/B]')
-	elif all(i in title for i in ('2160p', 'remux')):
-		info_append('[B]HDR[/B]')
-	if '[B]D/VISION[/B]' in info:
-		if any(i in title for i in ('.hdr.', '.hdr10.', 'hdr.10')) or 'hybrid' in title:
-			info_append('[B]HDR[/B]')
-		if '[B]HDR[/B]' in info:
-			info_append('[B]HYBRID[/B]')
-	if any(i in title for i in ('avc', 'h264', 'h.264', 'x264', 'x.264')):
-		info_append('AVC')
-	elif '.av1.' in title:
-		info_append('[B]AV1[/B]')
-	elif any(i in title for i in ('h265', 'h.265', 'hevc', 'x265', 'x.265')):
-		info_append('[B]HEVC[/B]')
-	elif any(i in info for i in ('[B]HDR[/B]', '[B]D/VISION[/B]')):
-		info_append('[B]HEVC[/B]')
-	if any(i in title for i in ('.imax.', '.(imax).', '.(.imax.).')):
-		info_append('IMAX')
-	elif any(i in title for i in ('.enhanced.', '.upscaled.', '.enhance.', '.upscale.')):
-		info_append('[B]AI ENHANCED/UPSCALED[/B]')
-	if '.atvp' in title:
-		info_append('APPLETV+')
-	elif any(i in title for i in ('xvid', '.x.vid')):
-		info_append('XVID')
-	elif any(i in title for i in ('divx', 'div2', 'div3', 'div4')):
-		info_append('DIVX')
-	if any(i in title for i in ('remux', 'bdremux')):
-		info_append('REMUX')
-	if any(i in title for i in ('bluray', 'blu.ray', 'bdrip', 'bd.rip')):
-		info_append('BLURAY')
-	elif any(i in title for i in ('dvdrip', 'dvd.rip')):
-		info_append('DVD')
-	elif any(i in title for i in ('.web.', 'webdl', 'web.dl', 'web-dl', 'webrip', 'web.rip')):
-		info_append('WEB')
-	elif 'hdtv' in title:
-		info_append('HDTV')
-	elif 'pdtv' in title:
-		info_append('PDTV')
-	elif any(i in title for i in ('.hdrip', '.hd.rip')):
-		info_append('HDRIP')
-	if 'atmos' in title:
-		info_append('ATMOS')
-	if any(i in title for i in ('true.hd', 'truehd')):
-		info_append('TRUEHD')
-	if any(i in title for i in ('dolby.digital.plus', 'dolbydigital.plus', 'dolbydigitalplus', 'dd.plus.', 'ddplus', '.ddp.', 'ddp2', 'ddp5', 'ddp7', 'eac3', '.e.ac3')):
-		info_append('DD+')
-	elif any(i in title for i in ('.dd.ex.', 'ddex', 'dolby.ex.', 'dolby.digital.ex.', 'dolbydigital.ex.')):
-		info_append('DD-EX')
-	elif any(i in title for i in ('dd2.', 'dd5', 'dd7', 'dolby.digital', 'dolbydigital', '.ac3', '.ac.3.', '.dd.')):
-		info_append('DD')
-	if 'aac' in title:
-		info_append('AAC')
-	elif 'mp3' in title:
-		info_append('MP3')
-	elif '.flac.' in title:
-		info_append('FLAC')
-	elif 'opus' in title and not title.endswith('opus.'):
-		info_append('OPUS')
-	if any(i in title for i in ('.dts.x.', 'dtsx')):
-		info_append('DTS-X')
-	elif any(i in title for i in ('hd.ma', 'hdma')):
-		info_append('DTS-HD MA')
-	elif any(i in title for i in ('dts.hd.', 'dtshd')):
-		info_append('DTS-HD')
-	elif '.dts' in title:
-		info_append('DTS')
-	if any(i in title for i in ('ch8.', '8ch.', '7.1ch', '7.1.')):
-		info_append('8CH')
-	elif any(i in title for i in ('ch7.', '7ch.', '6.1ch', '6.1.')):
-		info_append('7CH')
-	elif any(i in title for i in ('ch6.', '6ch.', '5.1ch', '5.1.')):
-		info_append('6CH')
-	elif any(i in title for i in ('ch2', '2ch', '2.0ch', '2.0.', 'audio.2.0.', 'stereo')):
-		info_append('2CH')
-	if '.wmv' in title:
-		info_append('WMV')
-	elif any(i in title for i in ('.mpg', '.mp2', '.mpeg', '.mpe', '.mpv', '.mp4', '.m4p', '.m4v', 'msmpeg', 'mpegurl')):
-		info_append('MPEG')
-	elif '.avi' in title:
-		info_append('AVI')
-	elif any(i in title for i in ('.mkv', 'matroska')):
-		info_append('MKV')
-	if any(i in title for i in ('hindi.eng', 'ara.eng', 'ces.eng', 'chi.eng', 'cze.eng', 'dan.eng', 'dut.eng', 'ell.eng', 'esl.eng', 'esp.eng', 'fin.eng', 'fra.eng', 'fre.eng',
-		'frn.eng', 'gai.eng', 'ger.eng', 'gle.eng', 'gre.eng', 'gtm.eng', 'heb.eng', 'hin.eng', 'hun.eng', 'ind.eng', 'iri.eng', 'ita.eng', 'jap.eng', 'jpn.eng', 'kor.eng',
-		'lat.eng', 'lebb.eng', 'lit.eng', 'nor.eng', 'pol.eng', 'por.eng', 'rus.eng', 'som.eng', 'spa.eng', 'sve.eng', 'swe.eng', 'tha.eng', 'tur.eng', 'uae.eng', 'ukr.eng',
-		'vie.eng', 'zho.eng', 'dual.audio', 'multi')):
-		info_append('MULTI-LANG')
-	if any(i in title for i in ('1xbet', 'betwin')):
-		info_append('ADS')
-	if any(i in title for i in ('subita', 'subfrench', 'subspanish', 'subtitula', 'swesub', 'nl.subs', 'subbed')):
-		info_append('SUBS')
-	return ' | '.join(filter(None, info))
+	if '3d' in found: info_append('[B]3D[/B]')
+	if 'sdr' in found: info_append('SDR')
+	elif 'dv' in found: info_append('[B]D/VISION[/B]')
+	elif 'hdr' in found or ('2160p' in found and 'remux' in found): info_append('[B]HDR[/B]')
+	if '[B]D/VISION[/B]' in info and 'dv_hdr' in found: info_append('[B]HDR[/B]')
+	if '[B]D/VISION[/B]' in info and '[B]HDR[/B]' in info: info_append('[B]HYBRID[/B]')
+	if 'avc' in found: info_append('AVC')
+	elif 'av1' in found: info_append('[B]AV1[/B]')
+	elif 'hevc' in found or '[B]HDR[/B]' in info or '[B]D/VISION[/B]' in info: info_append('[B]HEVC[/B]')
+	if 'imax' in found: info_append('IMAX')
+	elif 'enhanced' in found: info_append('[B]AI ENHANCED/UPSCALED[/B]')
+	if 'atvp' in found: info_append('APPLETV+')
+	elif 'xvid' in found: info_append('XVID')
+	elif 'divx' in found: info_append('DIVX')
+	if 'remux' in found: info_append('REMUX')
+	for group, token in (('bluray', 'BLURAY'), ('dvd', 'DVD'), ('web', 'WEB'), ('hdtv', 'HDTV'), ('pdtv', 'PDTV'), ('hdrip', 'HDRIP')):
+		if group in found:
+			info_append(token)
+			break
+	if 'atmos' in found: info_append('ATMOS')
+	if 'truehd' in found: info_append('TRUEHD')
+	if 'ddp' in found: info_append('DD+')
+	elif 'ddex' in found: info_append('DD-EX')
+	elif 'dd' in found: info_append('DD')
+	if 'aac' in found: info_append('AAC')
+	elif 'mp3' in found: info_append('MP3')
+	elif 'flac' in found: info_append('FLAC')
+	elif 'opus' in found and not title.endswith('opus.'): info_append('OPUS')
+	for groups in ((('dtsx', 'DTS-X'), ('dtshdma', 'DTS-HD MA'), ('dtshd', 'DTS-HD'), ('dts', 'DTS')), (('8ch', '8CH'), ('7ch', '7CH'), ('6ch', '6CH'), ('2ch', '2CH')),
+					(('wmv', 'WMV'), ('mpeg', 'MPEG'), ('avi', 'AVI'), ('mkv', 'MKV'))):
+		for group, token in groups:
+			if group in found:
+				info_append(token)
+				break
+	if 'multi' in found: info_append('MULTI-LANG')
+	if 'ads' in found: info_append('ADS')
+	if 'subs' in found: info_append('SUBS')
+	return quality, ' | '.join(info), sum(release_info_bits[i] for i in info)
+
+@lru_cache(maxsize=4096)
+def release_info_flags(extra_info):
+	return sum(release_info_bits.get(i, 0) for i in set(extra_info.split(' | ')))
+
+@lru_cache(maxsize=None)
+def release_filter_mask(key):
+	# Flags of every info token containing key, so "flags & mask" matches the old "key in extraInfo" test.
+	mask = 0
+	for token, bit in release_info_bits.items():
+		if key in token: mask |= bit
+	return mask
+
+def get_release_quality(release_info):
+	return parse_release_info(release_info)[0]
+
+def get_info(title):
+	return parse_release_info(title)[1]
 
 def get_cache_expiry(media_type, meta, season):
 	try:
@@ -386,6 +509,8 @@ def get_cache_expiry(media_type, meta, season):
 	except: single_expiry, season_expiry, show_expiry = 72, 72, 240
 	return single_expiry, season_expiry, show_expiry
 
+external_service_results = {}
+
 def get_external_cache_status(debrid, unchecked_hashes, data, active_debrid):
 	def _process(service, hashes):
 		result = []
@@ -402,11 +527,16 @@ def get_external_cache_status(debrid, unchecked_hashes, data, active_debrid):
 			try:
 				if 'tvshowtitle' in data: url = '%s%s' % (base_link, '/stream/series/%s:%s:%s.json' % (imdb_id, data['season'], data['episode']))
 				else: url = '%s%s' % (base_link, '/stream/movie/%s.json' % imdb_id)
-				result = requests.get(url, headers=headers, timeout=9)
-				result = result.json()['streams']
-				if result:
-					result = [re.search(r'\b\w{40}\b', i.get('url')) for i in result if name_test in i['name']]
-					result = [i.group() for i in result if i]
+				# These services answer per title rather than per hash, so the answer is kept briefly for the next batch of the same scrape.
+				expires, result = external_service_results.get(url, (0, None))
+				if expires < time.time():
+					result = make_session(base_link).get(url, headers=headers, timeout=9)
+					result = result.json()['streams']
+					if result:
+						result = [re.search(r'\b\w{40}\b', i.get('url')) for i in result if name_test in i['name']]
+						result = [i.group() for i in result if i]
+					if len(external_service_results) > 50: external_service_results.clear()
+					external_service_results[url] = (time.time() + 120, result)
 			except: pass
 		elif service == 'dmm':
 			import ctypes, random
@@ -446,29 +576,27 @@ def get_external_cache_status(debrid, unchecked_hashes, data, active_debrid):
 			def fetch(hash_chunk):
 				try:
 					json_data = {'dmmProblemKey': dmmProblemKey, 'solution': solution, 'imdbId': imdb_id, 'hashes': hash_chunk}
-					r = requests.post('https://debridmediamanager.com/api/availability/check', json=json_data, timeout=9).json()
+					r = make_session(dmm_url).post(dmm_url, json=json_data, timeout=9).json()
 					r = [i['hash'] for i in r['available'] if 'hash' in i]
 					result_extend(r)
 				except: pass
 			result = []
 			result_extend = result.extend
+			dmm_url = 'https://debridmediamanager.com/api/availability/check'
 			dmmProblemKey, solution = get_secret()
-			unchecked_hashes_chunks = list(chunks(unchecked_hashes, 100))
-			threads = [Thread(target=fetch, args=(item,)) for item in unchecked_hashes_chunks]
-			[i.start() for i in threads]
-			[i.join() for i in threads]
+			worker_pool('debrid').map(fetch, chunks(unchecked_hashes, 100))
 		results.extend(result)
 	try:
 		results = []
 		imdb_id = data['imdb']
 		debrid_name, services, token = {'Real-Debrid': ('realdebrid', ['torrentio'], get_setting('fenlight.rd.token')),
 										'AllDebrid': ('alldebrid', ['mediafusion'], get_setting('fenlight.ad.token'))}[debrid]
-		threads = [Thread(target=_process, args=(item, unchecked_hashes)) for item in services]
-		[i.start() for i in threads]
-		[i.join() for i in threads]
+		worker_pool('debrid').map(lambda service: _process(service, unchecked_hashes), services)
 		results = list(set(results))
 	except: pass
 	if debrid == 'Real-Debrid':
-		try: _process('dmm', [i for i in unchecked_hashes if not i in results])
+		try:
+			found = set(results)
+			_process('dmm', [i for i in unchecked_hashes if not i in found])
 		except: pass
 	return results
\ No newline at end of file
@@ -6,9 +6,9 @@ from windows.base_window import open_window, create_window
 from caches.episode_groups_cache import episode_groups_cache
 from caches.settings_cache import get_setting
 from scrapers import external, folders
-from modules import debrid, kodi_utils, settings, metadata, watched_status
+from modules import debrid, kodi_utils, settings, metadata, watched_status, timings
 from modules.player import FenLightPlayer
-from modules.source_utils import get_cache_expiry, make_alias_dict, include_exclude_filters
+from modules.source_utils import ScrapeProgress, result_bus, get_cache_expiry, make_alias_dict, include_exclude_filters, release_info_flags, release_filter_mask
 from modules.utils import clean_file_name, string_to_float, safe_string, remove_accents, get_datetime, append_module_to_syspath, manual_function_import
 logger = kodi_utils.logger
 
@@ -19,13 +19,11 @@ class Sources():
 		self.threads, self.providers, self.sources, self.internal_scraper_names, self.remove_scrapers = [], [], [], [], ['external']
 		self.rescrape_cache_ignored, self.original_year_ignored, self.rescrape_with_all, self.rescrape_with_episode_group = False, False, False, False
 		self.clear_properties, self.filters_ignored, self.active_folders, self.resolve_dialog_made, self.episode_group_used = True, False, False, False, False
-		self.sources_total = self.sources_4k = self.sources_1080p = self.sources_720p = self.sources_sd = 0
+		self.progress = ScrapeProgress()
 		self.prescrape, self.disabled_ext_ignored = 'true', 'false'
 		self.ext_name, self.ext_folder = '', ''
 		self.progress_dialog, self.progress_thread = None, None
 		self.playing_filename = ''
-		self.count_tuple = (('sources_4k', '4K', self._quality_length), ('sources_1080p', '1080p', self._quality_length), ('sources_720p', '720p', self._quality_length),
-							('sources_sd', '', self._quality_length_sd), ('sources_total', '', self._quality_length_final))
 		self.filter_keys = include_exclude_filters()
 		self.filter_keys.pop('hybrid')
 		self.default_internal_scrapers = ('easynews', 'rd_cloud', 'pm_cloud', 'ad_cloud', 'oc_cloud', 'tb_cloud', 'folders', 'jellyfin')
@@ -37,6 +35,7 @@ class Sources():
 		'ed_browse': ('apis.easydebrid_api', 'EasyDebridAPI'), 'TorBox': ('apis.torbox_api', 'TorBoxAPI'), 'tb_cloud': ('apis.torbox_api', 'TorBoxAPI'),
 		'tb_browse': ('apis.torbox_api', 'TorBoxAPI')}
 
+	@timings.timed_request('playback')
 	def playback_prep(self, params=None):
 		kodi_utils.hide_busy_dialog()
 		if params: self.params = params
@@ -69,9 +68,11 @@ class Sources():
 		else: self.season, self.episode, self.custom_season, self.custom_episode = '', '', '', ''
 		if 'autoplay' in self.params: self.autoplay = params_get('autoplay', 'false') == 'true'
 		else: self.autoplay = settings.auto_play(self.media_type)
+		self.early_autoplay = self.autoplay and not self.autoscrape and settings.early_autoplay(self.media_type)
+		timings.note(media_type=self.media_type, tmdb_id=self.tmdb_id, season=self.season, episode=self.episode, autoplay=self.autoplay, background=self.background)
 		self.get_meta()
 		self.determine_scrapers_status()
-		self.sleep_time, self.provider_sort_ranks, self.scraper_settings = 100, settings.provider_sort_ranks(), settings.scraping_settings()
+		self.provider_sort_ranks, self.scraper_settings = settings.provider_sort_ranks(), settings.scraping_settings()
 		self.include_prerelease_results, self.ignore_results_filter = settings.include_prerelease_results(), settings.ignore_results_filter()
 		self.limit_resolve = settings.limit_resolve()
 		self.weight_size = settings.size_sort_weighted()
@@ -127,12 +128,14 @@ class Sources():
 		if self.active_folders: self.append_folder_scrapers(self.providers)
 		self.providers.extend(self.internal_sources())
 		if self.providers:
-			for i in self.providers: threads_append(Thread(target=self.activate_providers, args=(i[0], i[1], False), name=i[2]))
+			for i in self.providers:
+				self.progress.start(i[2])
+				threads_append(Thread(target=self.progress.run, args=(i[2], self.activate_providers, i[0], i[1], False), name=i[2]))
 			[i.start() for i in self.threads]
 		if self.active_external or self.background:
 			if self.active_external:
 				self.external_args = (self.meta, self.external_providers, self.debrid_enabled, self.external_cache_check, self.internal_scraper_names,
-										self.prescrape_sources, self.progress_dialog, self.disabled_ext_ignored)
+										self.prescrape_sources, self.progress_dialog, self.disabled_ext_ignored, self.autoplay_filter if self.early_autoplay else None)
 				self.activate_providers('external', external, False)
 			if self.background: [i.join() for i in self.threads]
 		elif self.active_internal_scrapers: self.scrapers_dialog()
@@ -146,22 +149,21 @@ class Sources():
 				self.remove_scrapers.append('folders')
 		self.prescrape_scrapers.extend(self.internal_sources(True))
 		if not self.prescrape_scrapers: return []
-		for i in self.prescrape_scrapers: threads_append(Thread(target=self.activate_providers, args=(i[0], i[1], True), name=i[2]))
+		for i in self.prescrape_scrapers:
+			self.progress.start(i[2])
+			threads_append(Thread(target=self.progress.run, args=(i[2], self.activate_providers, i[0], i[1], True), name=i[2]))
 		[i.start() for i in self.prescrape_threads]
 		self.remove_scrapers.extend(i[2] for i in self.prescrape_scrapers)
 		if self.background: [i.join() for i in self.prescrape_threads]
 		else: self.scrapers_dialog()
 		return self.prescrape_sources
 
+	@timings.timed('process_results')
 	def process_results(self, results):
 		results = self.sort_results(results)
-		self.uncached_results = [i for i in results if 'Uncached' in i.get('cache_provider', '')]
-		results = [i for i in results if not i in self.uncached_results]
+		self.uncached_results, results = self._partition(results, self._is_uncached)
 		if self.ignore_scrape_filters: self.filters_ignored = True
-		else:
-			results = self.filter_results(results)
-			results = self.filter_audio(results)
-			for file_type in self.filter_keys: results = self.special_filter(results, file_type)
+		else: results = self.filter_results(results)
 		results = self.sort_preferred_filters(results)
 		if self.prescrape:
 			self.all_scrapers = self.active_internal_scrapers
@@ -180,44 +182,56 @@ class Sources():
 	def sort_results(self, results):
 		results = [dict(i, **{
 			'provider_rank': self._get_provider_rank(i['debrid'].lower()), 'quality_rank': self._get_quality_rank(i.get('quality', 'SD')),
-			'size_rank': self._get_size_rank(i)}) for i in results]
+			'size_rank': self._get_size_rank(i), 'info_flags': release_info_flags(i['extraInfo'])}) for i in results]
 		results.sort(key=self.sort_function)
 		results = self._sort_uncached_results(results)
 		return results
 
 	def filter_results(self, results):
-		if self.folders_ignore_filters:
-			folder_results = [i for i in results if i['scrape_provider'] == 'folders']
-			results = [i for i in results if not i in folder_results]
-		else: folder_results = []
-		results = [i for i in results if i['quality'] in self.quality_filter]
-		if self.filter_size_method:
-			min_size = string_to_float(get_setting('fenlight.results.%s_size_min' % self.media_type, '0'), '0') / 1000
-			if min_size == 0.0 and not self.include_unknown_size: min_size = 0.02
-			if self.filter_size_method == 1:
-				duration = self.meta['duration'] or (5400 if self.media_type == 'movie' else 2400)
-				max_size = ((0.125 * (0.90 * string_to_float(get_setting('results.line_speed', '25'), '25'))) * duration)/1000
-			elif self.filter_size_method == 2:
-				max_size = string_to_float(get_setting('fenlight.results.%s_size_max' % self.media_type, '10000'), '10000') / 1000
-			results = [i for i in results if i['scrape_provider'] == 'folders' or min_size <= i['size'] <= max_size]
-		results += folder_results
-		return results
-
-	def filter_audio(self, results):
-		a_filters = settings.audio_filters()
-		return [i for i in results if not any(x in i['extraInfo'] for x in a_filters)]
-
-	def special_filter(self, results, file_type):
-		enable_setting, key = settings.filter_status(file_type), self.filter_keys[file_type]
-		if key == 'HEVC' and enable_setting == 0:
-			hevc_max_quality = self._get_quality_rank(get_setting('fenlight.filter.hevc.%s' % ('max_autoplay_quality' if self.autoplay else 'max_quality'), '4K'))
-			results = [i for i in results if not key in i['extraInfo'] or i['quality_rank'] >= hevc_max_quality]
-		if enable_setting == 1:
-			if key in ('D/VISION', 'HDR'):
-				if not settings.filter_status({'D/VISION': 'hdr', 'HDR': 'dv'}[key]) == 0: results = [i for i in results if not key in i['extraInfo']]
-				else: results = [i for i in results if not (key in i['extraInfo'] and not 'HYBRID' in i['extraInfo'])]
-			else: results = [i for i in results if not key in i['extraInfo']]
-		return results
+		# Quality, size, audio and special filters in one pass. Folder results skip quality and size when set to ignore filters, and go last.
+		quality_filter, size_range = set(self.quality_filter), self.size_filter_range()
+		reject_mask, hybrid_masks, hevc_rule = self.info_filter_rules()
+		hybrid_mask = release_filter_mask('HYBRID')
+		filtered, folder_results = [], []
+		for i in results:
+			flags, is_folder = i['info_flags'], i['scrape_provider'] == 'folders'
+			if flags & reject_mask: continue
+			if hybrid_masks and not flags & hybrid_mask and any(flags & x for x in hybrid_masks): continue
+			if hevc_rule and flags & hevc_rule[0] and i['quality_rank'] < hevc_rule[1]: continue
+			if is_folder and self.folders_ignore_filters: folder_results.append(i)
+			elif i['quality'] in quality_filter and (not size_range or is_folder or size_range[0] <= i['size'] <= size_range[1]): filtered.append(i)
+		return filtered + folder_results
+
+	def autoplay_filter(self, results):
+		# Called by the external scraper on each provider's results as they arrive, so early autoplay only stops on a result autoplay would use.
+		results = [dict(i, **{'quality_rank': self._get_quality_rank(i.get('quality', 'SD')), 'info_flags': release_info_flags(i['extraInfo'])}) for i in results]
+		if self.ignore_scrape_filters: return results
+		return self.filter_results(results)
+
+	def size_filter_range(self):
+		if not self.filter_size_method: return None
+		min_size = string_to_float(get_setting('fenlight.results.%s_size_min' % self.media_type, '0'), '0') / 1000
+		if min_size == 0.0 and not self.include_unknown_size: min_size = 0.02
+		if self.filter_size_method == 1:
+			duration = self.meta['duration'] or (5400 if self.media_type == 'movie' else 2400)
+			max_size = ((0.125 * (0.90 * string_to_float(get_setting('results.line_speed', '25'), '25'))) * duration)/1000
+		elif self.filter_size_method == 2:
+			max_size = string_to_float(get_setting('fenlight.results.%s_size_max' % self.media_type, '10000'), '10000') / 1000
+		return min_size, max_size
+
+	def info_filter_rules(self):
+		# Audio and special filters reduced to flag masks: results with any reject_mask flag go, hybrid_masks go unless also HYBRID,
+		# and hevc_rule drops HEVC results below the max HEVC quality.
+		reject_mask, hybrid_masks, hevc_rule = 0, [], None
+		for x in settings.audio_filters(): reject_mask |= release_filter_mask(x)
+		for file_type, key in self.filter_keys.items():
+			enable_setting, key_mask = settings.filter_status(file_type), release_filter_mask(key)
+			if key == 'HEVC' and enable_setting == 0:
+				hevc_rule = (key_mask, self._get_quality_rank(get_setting('fenlight.filter.hevc.%s' % ('max_autoplay_quality' if self.autoplay else 'max_quality'), '4K')))
+			if enable_setting == 1:
+				if key in ('D/VISION', 'HDR') and settings.filter_status({'D/VISION': 'hdr', 'HDR': 'dv'}[key]) == 0: hybrid_masks.append(key_mask)
+				else: reject_mask |= key_mask
+		return reject_mask, hybrid_masks, hevc_rule
 
 	def sort_preferred_filters(self, results):
 		if settings.sort_to_top_filter(self.autoplay):
@@ -225,11 +239,13 @@ class Sources():
 				preferences = settings.preferred_filters()
 				if not preferences: return results
 				preferences = [self.filter_keys.get(i.lower(), i) for i in preferences]
-				preference_results = [i for i in results if any(x in i['extraInfo'] for x in preferences)]
+				pref_masks = [(x, release_filter_mask(x)) for x in preferences]
+				pref_mask = 0
+				for x, mask in pref_masks: pref_mask |= mask
+				preference_results, results = self._partition(results, lambda k: k['info_flags'] & pref_mask)
 				if not preference_results: return results
-				results = [i for i in results if not i in preference_results]
 				preference_results = sorted([dict(item, **{'pref_includes': sum([{0:100, 1:50, 2:20, 3:10, 4:5, 5:2}[preferences.index(x)] \
-					for x in [i for i in preferences if i in item['extraInfo']]])}) for item in preference_results], key=lambda k: k['pref_includes'], reverse=True)
+					for x, mask in pref_masks if item['info_flags'] & mask])}) for item in preference_results], key=lambda k: k['pref_includes'], reverse=True)
 				return preference_results + results
 			except: pass
 		return results
@@ -240,9 +256,8 @@ class Sources():
 			if 'folders' in self.all_scrapers and settings.sort_to_top('folders'): sort_first_scrapers.append('folders')
 			sort_first_scrapers.extend([i for i in self.all_scrapers if i in ('rd_cloud', 'pm_cloud', 'ad_cloud', 'oc_cloud', 'tb_cloud') and settings.sort_to_top(i)])
 			if not sort_first_scrapers: return results
-			sort_first = [i for i in results if i['scrape_provider'] in sort_first_scrapers]
+			sort_first, sort_last = self._partition(results, lambda k: k['scrape_provider'] in sort_first_scrapers)
 			sort_first.sort(key=lambda k: (self._sort_folder_to_top(k['scrape_provider']), k['quality_rank']))
-			sort_last = [i for i in results if not i in sort_first]
 			results = sort_first + sort_last
 		except: pass
 		return results
@@ -283,7 +298,7 @@ class Sources():
 		return True
 
 	def activate_providers(self, module_type, function, prescrape):
-		sources = self._get_module(module_type, function).results(self.search_info)
+		with timings.span('%s_scraper' % module_type, prescrape=prescrape): sources = self._get_module(module_type, function).results(self.search_info)
 		if not sources: return
 		if prescrape: self.prescrape_sources.extend(sources)
 		else: self.sources.extend(sources)
@@ -345,21 +360,21 @@ class Sources():
 	def scrapers_dialog(self):
 		def _scraperDialog():
 			monitor = kodi_utils.kodi_monitor()
-			start_time = time.time()
+			start_time, timeout, version = time.time(), 25, 0
+			end_time = start_time + timeout
 			while not self.progress_dialog.iscanceled() and not monitor.abortRequested():
 				try:
-					remaining_providers = [x.getName() for x in _threads if x.is_alive() is True]
+					# Read before the results are collected, as a provider only finishes after publishing its results.
+					remaining = self.progress.remaining()
 					self._process_internal_results()
-					current_progress = max((time.time() - start_time), 0)
-					line1 = ', '.join(remaining_providers).upper()
-					percent = int((current_progress/float(25))*100)
-					self.progress_dialog.update_scraper(self.sources_sd, self.sources_720p, self.sources_1080p, self.sources_4k, self.sources_total, line1, percent)
-					kodi_utils.sleep(self.sleep_time)
-					if len(remaining_providers) == 0: break
-					if percent >= 100: break
+					current_time = time.time()
+					percent = int((max(current_time - start_time, 0)/float(timeout))*100)
+					self.progress_dialog.update_scraper(*self.progress.status(), percent)
+					if remaining == 0 or current_time >= end_time: break
+					version = self.progress.wait(version, end_time)
 				except:	return self._kill_progress_dialog()
-		if self.prescrape: scraper_list, _threads = self.prescrape_scrapers, self.prescrape_threads
-		else: scraper_list, _threads = self.providers, self.threads
+		if self.prescrape: scraper_list = self.prescrape_scrapers
+		else: scraper_list = self.providers
 		self.internal_scrapers = self._get_active_scraper_names(scraper_list)
 		if not self.internal_scrapers: return
 		_scraperDialog()
@@ -368,10 +383,11 @@ class Sources():
 
 	def display_results(self, results):
 		window_format, window_number = settings.results_format()
-		action, chosen_item = open_window(('windows.sources', 'SourcesResults'), 'sources_results.xml',
-				window_format=window_format, window_id=window_number, results=results, meta=self.meta, episode_group_label=self.episode_group_label,
-				scraper_settings=self.scraper_settings, prescrape=self.prescrape, filters_ignored=self.filters_ignored,
-				uncached_results=self.uncached_results, external_cache_check=self.external_cache_check)
+		with timings.span('results_window'):
+			action, chosen_item = open_window(('windows.sources', 'SourcesResults'), 'sources_results.xml',
+					window_format=window_format, window_id=window_number, results=results, meta=self.meta, episode_group_label=self.episode_group_label,
+					scraper_settings=self.scraper_settings, prescrape=self.prescrape, filters_ignored=self.filters_ignored,
+					uncached_results=self.uncached_results, external_cache_check=self.external_cache_check)
 		if not action: self._kill_progress_dialog()
 		elif action == 'play': return self.play_file(results, chosen_item)
 		elif self.prescrape and action == 'perform_full_search':
@@ -480,16 +496,7 @@ class Sources():
 		return ep_name
 
 	def _process_internal_results(self):
-		for i in self.internal_scrapers:
-			win_property = kodi_utils.get_property('fenlight.internal_results.%s' % i)
-			if win_property in ('checked', '', None): continue
-			try: sources = json.loads(win_property)
-			except: continue
-			kodi_utils.set_property('fenlight.internal_results.%s' % i, 'checked')
-			self._sources_quality_count(sources)
-	
-	def _sources_quality_count(self, sources):
-		for item in self.count_tuple: setattr(self, item[0], getattr(self, item[0]) + item[2](sources, item[1]))
+		for i, sources in result_bus.collect(self.internal_scrapers): self.progress.add(sources)
 
 	def _quality_filter(self):
 		setting = 'results_quality_%s' % self.media_type if not self.autoplay else 'autoplay_quality_%s' % self.media_type
@@ -512,10 +519,19 @@ class Sources():
 		else: return 1
 
 	def _sort_uncached_results(self, results):
-		uncached = [i for i in results if 'Uncached' in i.get('cache_provider', '')]
-		cached = [i for i in results if not i in uncached]
+		uncached, cached = self._partition(results, self._is_uncached)
 		return cached + uncached
 
+	def _is_uncached(self, item):
+		return 'Uncached' in item.get('cache_provider', '')
+
+	def _partition(self, results, condition):
+		# Stable split into (matching, rest) by position, instead of the dict equality lookups of "not i in other_list".
+		matching, rest = [], []
+		for i in results: (matching if condition(i) else rest).append(i)
+		return matching, rest
+
+	@timings.timed('get_meta')
 	def get_meta(self):
 		if self.media_type == 'movie': self.meta = metadata.movie_meta('tmdb_id', self.tmdb_id, settings.tmdb_api_key(), settings.mpaa_region(), get_datetime())
 		else:
@@ -546,11 +562,10 @@ class Sources():
 		return module
 
 	def _clear_properties(self):
-		def_internal = self.default_internal_scrapers
-		for item in def_internal: kodi_utils.clear_property('fenlight.internal_results.%s' % item)
-		if self.active_folders:
-			for item in self.folder_info: kodi_utils.clear_property('fenlight.internal_results.%s' % item[0])
+		result_bus.clear(self.default_internal_scrapers)
+		if self.active_folders: result_bus.clear([i[0] for i in self.folder_info])
 
+	@timings.timed('progress_window')
 	def _make_progress_dialog(self):
 		self.progress_dialog = create_window(('windows.sources', 'SourcesPlayback'), 'sources_playback.xml', meta=self.meta)
 		self.progress_thread = Thread(target=self.progress_dialog.run)
@@ -606,6 +621,7 @@ class Sources():
 		self._kill_progress_dialog()
 		return FenLightPlayer().run(link, 'video')
 
+	@timings.timed('play_file')
 	def play_file(self, results, source={}):
 		self.playback_successful, self.cancel_all_playback = None, False
 		retry_easynews = settings.easynews_playback_method('retry')
@@ -773,6 +789,7 @@ class Sources():
 	def debrid_importer(self, debrid_provider):
 		return manual_function_import(*self.debrids[debrid_provider])
 
+	@timings.timed('resolve_sources')
 	def resolve_sources(self, item, meta=None):
 		if meta: self.meta = meta
 		url = None
@@ -815,12 +832,3 @@ class Sources():
 					url = debrid_function().add_headers_to_url(item_id)
 		except: pass
 		return url
-
-	def _quality_length(self, items, quality):
-		return len([i for i in items if i['quality'] == quality])
-
-	def _quality_length_sd(self, items, dummy):
-		return len([i for i in items if i['quality'] in ('SD', 'CAM', 'TELE', 'SYNC')])
-
-	def _quality_length_final(self, items, dummy):
-		return len(items)
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import json
+import time
+from threading import Lock, current_thread
+from modules.settings import playback_timings
+from modules.kodi_utils import addon_profile, kodi_version, logger
+
+# Spans of the playback request being timed. With the setting off no timeline is started, and span() and timed() only check current.
+current, timeline_lock = None, Lock()
+log_file, max_log_size = 'playback_timings.jsonl', 512 * 1024
+
+class Timeline:
+	def __init__(self, name):
+		self.name, self.info, self.spans, self.lock = name, {}, [], Lock()
+		self.started, self.start_counter = time.time(), time.perf_counter()
+
+	def add(self, name, start, end, info):
+		span = {'name': name, 'start_ms': round((start - self.start_counter) * 1000, 1), 'ms': round((end - start) * 1000, 1), 'thread': current_thread().name}
+		span.update(info)
+		with self.lock: self.spans.append(span)
+
+	def record(self, info):
+		with self.lock: spans = sorted(self.spans, key=lambda k: k['start_ms'])
+		record = {'name': self.name, 'started': round(self.started, 3), 'total_ms': round((time.perf_counter() - self.start_counter) * 1000, 1),
+				'kodi': kodi_version(), 'platform': sys.platform}
+		record.update(self.info)
+		record.update(info)
+		record['spans'] = spans
+		try:
+			from caches.base_cache import single_flight
+			from caches.meta_cache import meta_cache
+			record['caches'] = {'meta_memory': meta_cache.memory_stats(), 'single_flight': single_flight.stats()}
+		except: pass
+		return record
+
+class Span:
+	def __init__(self, timeline, name, info):
+		self.timeline, self.name, self.info = timeline, name, info
+
+	def __enter__(self):
+		self.start = time.perf_counter()
+		return self
+
+	def __exit__(self, *args):
+		self.timeline.add(self.name, self.start, time.perf_counter(), self.info)
+		return False
+
+class NullSpan:
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *args):
+		return False
+
+null_span = NullSpan()
+
+def start(name):
+	# Returns None when timings are off or a request is already being timed, as when playback_prep calls itself to rescrape.
+	global current
+	if not playback_timings(): return None
+	with timeline_lock:
+		if current is not None: return None
+		current = Timeline(name)
+		return current
+
+def finish(timeline, **info):
+	# Writes the timeline once, from whichever of the request's exits reaches it first.
+	global current
+	if timeline is None: return
+	with timeline_lock:
+		if current is not timeline: return
+		current = None
+	try: write(timeline.record(info))
+	except Exception as e: logger('playback timings Exception', str(e))
+
+def note(**info):
+	timeline = current
+	if timeline is not None: timeline.info.update(info)
+
+def span(name, **info):
+	timeline = current
+	if timeline is None: return null_span
+	return Span(timeline, name, info)
+
+def timed(name):
+	def decorator(function):
+		def wrap(*args, **kwargs):
+			timeline = current
+			if timeline is None: return function(*args, **kwargs)
+			with Span(timeline, name, {}): return function(*args, **kwargs)
+		return wrap
+	return decorator
+
+def timed_request(name):
+	# Times every call of the decorated function that is not already part of a timed request.
+	def decorator(function):
+		def wrap(*args, **kwargs):
+			timeline = start(name)
+			try: return function(*args, **kwargs)
+			finally: finish(timeline)
+		return wrap
+	return decorator
+
+def write(record):
+	# One JSON object per line. The file is rotated to a single .1 copy, so a device never keeps more than twice max_log_size.
+	file_path = os.path.join(addon_profile(), log_file)
+	try:
+		if os.path.getsize(file_path) > max_log_size: os.replace(file_path, file_path.replace('.jsonl', '.1.jsonl'))
+	except OSError: pass
+	with open(file_path, 'a', encoding='utf-8') as f: f.write(json.dumps(record, separators=(',', ':')) + '\n')
+	logger('PLAYBACK TIMINGS', '%s %sms' % (record['name'], record['total_ms']))
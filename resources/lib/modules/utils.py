@@ -6,50 +6,108 @@ import random
 import _strptime
 import unicodedata
 from html import unescape
-from queue import SimpleQueue
-from threading import Thread, activeCount
+from collections import deque
+from threading import Thread, Lock, Event, Condition
 from importlib import import_module
 from datetime import datetime, timedelta, date
 from modules.settings import max_threads
-from modules.kodi_utils import sleep
 # from modules.kodi_utils import logger
 
-class TaskPool:
-	def __init__(self):
-		self._queue = SimpleQueue()
-
-	def _thread_target(self, queue, target):
-		while not queue.empty():
-			try: target(*queue.get())
-			except: pass
-
-	def tasks(self, _target, _list, _max_size=60):
-		[self._queue.put(tag) for tag in _list]
-		threads = [Thread(target=self._thread_target, args=(self._queue, _target)) for i in range(_max_size)]
-		[i.start() for i in threads]
-		return threads
+class WorkerJob:
+	# Handle for work submitted to a WorkerPool, usable like a Thread (join, is_alive, getName). Exceptions are kept, not raised, as with a Thread.
+	def __init__(self, function, args, name):
+		self.function, self.args, self.name = function, args, name
+		self.lock, self.done = Lock(), Event()
+		self.started, self.cancelled, self.result, self.error = False, False, None, None
+
+	def run(self):
+		with self.lock:
+			if self.started or self.cancelled: return
+			self.started = True
+		try: self.result = self.function(*self.args)
+		except Exception as e: self.error = e
+		finally: self.done.set()
+
+	def join(self, timeout=None):
+		# A job no worker has picked up yet is run by the joining thread, so jobs waiting on jobs can never starve a full pool.
+		if timeout is None: self.run()
+		self.done.wait(timeout)
+
+	def cancel(self):
+		with self.lock:
+			if self.started: return False
+			self.cancelled = True
+		self.done.set()
+		return True
 
-	def tasks_enumerate(self, _target, _list, _max_size=60):
-		[self._queue.put((p, tag)) for p, tag in enumerate(_list, 1)]
-		threads = [Thread(target=self._thread_target, args=(self._queue, _target)) for i in range(_max_size)]
-		[i.start() for i in threads]
-		return threads
+	def is_alive(self):
+		return not self.done.is_set()
+
+	def getName(self):
+		return self.name
+
+class WorkerPool:
+	# Threads are started only while there is queued work and no idle worker, up to size, and idle workers exit after idle_time.
+	# Within a plugin call, lists built one after another reuse the same threads.
+	idle_time = 2
+
+	def __init__(self, size):
+		self.size, self.jobs, self.lock = size, deque(), Lock()
+		self.wakeup = Condition(self.lock)
+		self.workers, self.busy = 0, 0
+
+	def submit(self, function, *args, name=None):
+		job = WorkerJob(function, args, name)
+		with self.lock:
+			self.jobs.append(job)
+			if len(self.jobs) > self.workers - self.busy and self.workers < self.size:
+				self.workers += 1
+				Thread(target=self._worker).start()
+			else: self.wakeup.notify()
+		return job
+
+	def map(self, function, items):
+		# Results in the order of items. Failed or cancelled items give None.
+		jobs = [self.submit(function, i) for i in items]
+		for i in jobs: i.join()
+		return [i.result for i in jobs]
+
+	def starmap(self, function, items):
+		jobs = [self.submit(function, *i) for i in items]
+		for i in jobs: i.join()
+		return [i.result for i in jobs]
+
+	def cancel(self, jobs):
+		return len([i for i in jobs if i.cancel()])
+
+	def _worker(self):
+		while True:
+			with self.lock:
+				while not self.jobs:
+					if not self.wakeup.wait(self.idle_time) and not self.jobs:
+						self.workers -= 1
+						return
+				job = self.jobs.popleft()
+				self.busy += 1
+			job.run()
+			with self.lock: self.busy -= 1
+
+# Separate pools so slow external scrapers can never hold up debrid checks or metadata. Pools without a size follow the max threads setting.
+worker_pool_sizes, worker_pools, worker_pools_lock = {'debrid': 10}, {}, Lock()
+
+def worker_pool(name='default'):
+	with worker_pools_lock:
+		pool = worker_pools.get(name)
+		if pool is None: pool = worker_pools[name] = WorkerPool(worker_pool_sizes.get(name) or max_threads())
+	return pool
 
 def make_thread_list(_target, _list):
-	_max_threads = max_threads()
-	for item in _list:
-		while activeCount() > _max_threads: sleep(1)
-		threaded_object = Thread(target=_target, args=(item,))
-		threaded_object.start()
-		yield threaded_object
+	submit = worker_pool().submit
+	for item in _list: yield submit(_target, item)
 
 def make_thread_list_enumerate(_target, _list):
-	_max_threads = max_threads()
-	for count, item in enumerate(_list):
-		while activeCount() > _max_threads: sleep(1)
-		threaded_object = Thread(target=_target, args=(count, item))
-		threaded_object.start()
-		yield threaded_object
+	submit = worker_pool().submit
+	for count, item in enumerate(_list): yield submit(_target, count, item)
 
 def change_image_resolution(image, replace_res):
 	return re.sub(r'(w185|w300|w342|w780|w1280|h632|original)', replace_res, image)
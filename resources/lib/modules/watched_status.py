@@ -2,7 +2,7 @@
 from datetime import datetime
 from threading import Thread
 from apis.trakt_api import trakt_watched_status_mark, trakt_official_status, trakt_progress, trakt_get_hidden_items
-from caches.base_cache import connect_database, database
+from caches.base_cache import connect_database, database, decode_data, update_watched_shows
 from caches.trakt_cache import clear_trakt_collection_watchlist_data
 from modules.kodi_utils import kodi_progress_background, sleep, get_video_database_path, notification, kodi_refresh
 from modules.utils import get_datetime, adjust_premiered_date, sort_for_article, make_thread_list
@@ -38,7 +38,8 @@ def get_hidden_progress_items(watched_indicators):
 		if watched_indicators == 0:
 			watched_db = get_database()
 			watched_info = watched_db.execute('SELECT status FROM watched_status WHERE db_type = ?', ('hidden_progress_items',)).fetchone()[0]
-			return eval(watched_info) or []
+			# Stored with repr so the list survives an add-on downgrade. decode_data still reads rows written as a BLOB.
+			return decode_data(watched_info) or []
 		else: return trakt_get_hidden_items('dropped')
 	except: return []
 
@@ -128,11 +129,12 @@ def get_progress_status_movie(progress_info, media_id):
 	except: percent = None
 	return percent
 
-def watched_info_tvshow(watched_db=None):
+def watched_info_tvshow(watched_db=None, media_id=None):
 	if not watched_db: watched_db = get_database()
 	try:
-		data = watched_db.execute('SELECT media_id, season, episode, title, MAX(last_played), COUNT(*) AS COUNTER FROM watched WHERE db_type = ? GROUP BY media_id',
-								('episode',)).fetchall()
+		if media_id: data = watched_db.execute('SELECT media_id, season, episode, title, last_played, total_played FROM watched_shows WHERE media_id = ?',
+												(str(media_id),)).fetchall()
+		else: data = watched_db.execute('SELECT media_id, season, episode, title, last_played, total_played FROM watched_shows').fetchall()
 		return dict([(i[0], {'media_id': i[0], 'season': i[1], 'episode': i[2], 'title': i[3], 'last_played': i[4], 'total_played': i[5]}) for i in data])
 	except: return {}
 
@@ -175,8 +177,8 @@ def get_progress_status_season(watched, aired_eps):
 
 def watched_info_episode(media_id, watched_db=None):
 	if not watched_db: watched_db = get_database()
-	try: watched_info = watched_db.execute('SELECT season, episode FROM watched WHERE db_type = ? AND media_id = ?', ('episode', str(media_id))).fetchall()
-	except: watched_info = []
+	try: watched_info = set(watched_db.execute('SELECT season, episode FROM watched WHERE db_type = ? AND media_id = ?', ('episode', str(media_id))).fetchall())
+	except: watched_info = set()
 	return watched_info
 
 def get_watched_status_episode(watched_info, season_episode):
@@ -389,6 +391,7 @@ def watched_status_mark(watched_indicators, media_type='', media_id='', action='
 			dbcon.execute('INSERT OR REPLACE INTO watched VALUES (?, ?, ?, ?, ?, ?)', (media_type, media_id, season, episode, last_played, title))
 		elif action == 'mark_as_unwatched':
 			dbcon.execute('DELETE FROM watched WHERE (db_type = ? and media_id = ? and season = ? and episode = ?)', (media_type, media_id, season, episode))
+		if media_type == 'episode': update_watched_shows(dbcon, (media_id,))
 		erase_bookmark(media_type, media_id, season, episode)
 		# if media_type == 'episode': clear_cache_watched_tvshow_status()
 	except: notification('Error')
@@ -400,6 +403,7 @@ def batch_watched_status_mark(watched_indicators, insert_list, action):
 			dbcon.executemany('INSERT OR IGNORE INTO watched VALUES (?, ?, ?, ?, ?, ?)', insert_list)
 		elif action == 'mark_as_unwatched':
 			dbcon.executemany('DELETE FROM watched WHERE (db_type = ? and media_id = ? and season = ? and episode = ?)', insert_list)
+		update_watched_shows(dbcon, [i[1] for i in insert_list if i[0] == 'episode'])
 		batch_erase_bookmark(watched_indicators, insert_list, action)
 		# clear_cache_watched_tvshow_status()
 	except: notification('Error')
@@ -407,11 +411,9 @@ def batch_watched_status_mark(watched_indicators, insert_list, action):
 def get_next_episodes(nextep_content):
 	watched_db = get_database()
 	if nextep_content == 0:
-		data = watched_db.execute('''WITH cte AS (SELECT *, ROW_NUMBER() OVER (PARTITION BY media_id ORDER BY season DESC, episode DESC) rn FROM watched WHERE db_type == ?)
-									SELECT media_id, season, episode, title, last_played FROM cte WHERE rn = 1''', ('episode',)).fetchall()
+		data = watched_db.execute('SELECT media_id, furthest_season, furthest_episode, title, furthest_played FROM watched_shows').fetchall()
 	else:
-		data = watched_db.execute('SELECT media_id, season, episode, title, MAX(last_played), COUNT(*) AS COUNTER FROM watched WHERE db_type = ? GROUP BY media_id',
-								('episode',)).fetchall()
+		data = watched_db.execute('SELECT media_id, season, episode, title, last_played FROM watched_shows').fetchall()
 	data = [{'media_ids': {'tmdb': int(i[0])}, 'season': int(i[1]), 'episode': int(i[2]), 'title': i[3], 'last_played': i[4]} for i in data]
 	data.sort(key=lambda x: (x['last_played']), reverse=True)
 	return data
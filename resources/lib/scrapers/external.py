@@ -1,17 +1,17 @@
 # -*- coding: utf-8 -*-
 import time
-import json
 import random
-from threading import Thread
+from threading import Event, Lock
 from caches.external_cache import external_cache
 from caches.settings_cache import get_setting
-from modules import kodi_utils, source_utils
+from modules import kodi_utils, source_utils, timings
 from modules.debrid import RD_check, PM_check, AD_check, OC_check, ED_check ,TB_check, query_local_cache
-from modules.utils import clean_file_name
+from modules.utils import clean_file_name, worker_pool
 # logger = kodi_utils.logger
 
 class source:
-	def __init__(self, meta, source_dict, active_debrid, external_cache_check, internal_scrapers, prescrape_sources, progress_dialog, disabled_ext_ignored=False):
+	def __init__(self, meta, source_dict, active_debrid, external_cache_check, internal_scrapers, prescrape_sources, progress_dialog, disabled_ext_ignored=False,
+				autoplay_filter=None):
 		self.monitor = kodi_utils.kodi_monitor()
 		self.scrape_provider = 'external'
 		self.progress_dialog = progress_dialog
@@ -20,18 +20,15 @@ class source:
 		self.background = self.meta.get('background', False)
 		self.active_debrid = active_debrid
 		self.source_dict, self.host_dict = source_dict, []
-		self.sources, self.all_internal_sources, self.processed_internal_scrapers = [], [], []
-		self.processed_internal_scrapers_append = self.processed_internal_scrapers.append
+		self.sources, self.all_internal_sources = [], []
 		self.internal_scrapers, self.prescrape_sources = internal_scrapers, prescrape_sources
 		self.internal_activated, self.internal_prescraped = len(self.internal_scrapers) > 0, len(self.prescrape_sources) > 0
-		self.processed_prescrape, self.threads_completed = False, False
+		self.processed_prescrape = False
 		self.timeout = 60 if disabled_ext_ignored else int(get_setting('fenlight.results.timeout', '20'))
-		self.sources_total = self.sources_4k = self.sources_1080p = self.sources_720p = self.sources_sd = 0
-		self.final_total = self.final_4k = self.final_1080p = self.final_720p = self.final_sd = 0
-		self.count_tuple = (('sources_4k', '4K', self._quality_length), ('sources_1080p', '1080p', self._quality_length), ('sources_720p', '720p', self._quality_length),
-							('sources_sd', '', self._quality_length_sd), ('sources_total', '', self.quality_length_final))
-		self.count_tuple_final = (('final_4k', '4K', self._quality_length), ('final_1080p', '1080p', self._quality_length), ('final_720p', '720p', self._quality_length),
-									('final_sd', '', self._quality_length_sd), ('final_total', '', self.quality_length_final))
+		self.progress = source_utils.ScrapeProgress()
+		self.autoplay_filter, self.autoplay_ready, self.stream_lock, self.stream_open = autoplay_filter, Event(), Lock(), True
+		self.stream_urls, self.stream_hashes, self.autoplay_candidates, self.check_jobs = set(), set(), [], {}
+		self.pending_hashes, self.checked_hashes, self.cached_hashes = [dict((i, x()) for i in self.active_debrid) for x in (list, set, set)]
 		self.debrid_runners = {'Real-Debrid': ('Real-Debrid', RD_check), 'Premiumize.me': ('Premiumize.me', PM_check), 'AllDebrid': ('AllDebrid', AD_check),
 							'Offcloud': ('Offcloud', OC_check), 'EasyDebrid': ('EasyDebrid', ED_check), 'TorBox': ('TorBox', TB_check)}
 
@@ -59,33 +56,34 @@ class source:
 		def _scraperDialog():
 			kodi_utils.hide_busy_dialog()
 			kodi_utils.sleep(200)
-			start_time = time.time()
+			start_time, version = time.time(), 0
+			end_time = start_time + self.timeout
+			for i in self.internal_scrapers: self.progress.start(i)
 			while not self.progress_dialog.iscanceled() and not self.monitor.abortRequested():
+				if self.autoplay_ready.is_set(): break
 				try:
-					alive_threads = [x.getName() for x in self.threads if x.is_alive()]
-					if self.internal_activated or self.internal_prescraped: alive_threads.extend(self.process_internal_results())
-					line1 =  ', '.join(alive_threads).upper()
-					percent = (max((time.time() - start_time), 0)/float(self.timeout))*100
-					self.progress_dialog.update_scraper(self.sources_sd, self.sources_720p, self.sources_1080p, self.sources_4k, self.sources_total, line1, percent)
-					if self.threads_completed:
-						len_alive_threads = len(alive_threads)
-						if len_alive_threads == 0 or percent >= 100: break
-					elif percent >= 100: break
-					kodi_utils.sleep(100)
+					# Read before the internal results are collected, as a provider only finishes after publishing its results.
+					remaining = self.progress.remaining()
+					if self.internal_activated or self.internal_prescraped: self.process_internal_results()
+					current_time = time.time()
+					percent = (max(current_time - start_time, 0)/float(self.timeout))*100
+					self.progress_dialog.update_scraper(*self.progress.status(), percent)
+					if remaining == 0 or current_time >= end_time: break
+					version = self.progress.wait(version, end_time)
 				except: pass
 			return
 		def _background():
-			kodi_utils.sleep(1500)
+			if self.autoplay_ready.wait(1.5): return
 			end_time = time.time() + self.timeout
 			while time.time() < end_time:
 				alive_threads = [x for x in self.threads if x.is_alive()]
 				len_alive_threads = len(alive_threads)
-				kodi_utils.sleep(1000)
+				if self.autoplay_ready.wait(1.0): return
 				if len_alive_threads <= 5: return
 				if len(self.sources) >= 100 * len_alive_threads: return
 		self.threads = []
 		self.threads_append = self.threads.append
-		if self.media_type == 'movie': Thread(target=self.process_movie_threads).start()
+		if self.media_type == 'movie': self.process_movie_threads()
 		else:
 			self.source_dict = [i for i in self.source_dict if i[1].hasEpisodes]
 			self.season_packs, self.show_packs = source_utils.pack_enable_check(self.meta, self.season, self.episode)
@@ -97,44 +95,46 @@ class source:
 					if self.show_packs: self.source_dict.extend([(i[0], i[1], 'Show') for i in pack_capable])
 					random.shuffle(self.source_dict)
 					self.source_dict.sort(key=lambda k: k[2])
-			Thread(target=self.process_episode_threads).start()
+			self.process_episode_threads()
 		if self.background: _background()
 		else: _scraperDialog()
+		worker_pool('scrapers').cancel(self.threads)
+		with self.stream_lock: self.stream_open = False
+		if self.autoplay_ready.is_set(): return self.process_autoplay_results()
 		current_results = list(self.sources)
 		if current_results: return self.process_results(current_results)
 		return []
 
 	def process_movie_threads(self):
+		submit = worker_pool('scrapers').submit
 		for i in self.source_dict:
 			provider, module = i[0], i[1]
-			threaded_object = Thread(target=self.get_movie_source, args=(provider, module), name=provider)
-			threaded_object.start()
-			self.threads_append(threaded_object)
-		self.threads_completed = True
+			self.progress.start(provider)
+			self.threads_append(submit(self.progress.run, provider, self.get_movie_source, provider, module, name=provider))
 
 	def process_episode_threads(self):
+		submit = worker_pool('scrapers').submit
 		for i in self.source_dict:
 			provider, module = i[0], i[1]
 			try: pack_arg = i[2]
 			except: pack_arg = ''
 			if pack_arg: provider_display = '%s (%s)' % (i[0], i[2])
 			else: provider_display = provider
-			threaded_object = Thread(target=self.get_episode_source, args=(provider, module, pack_arg), name=provider_display)
-			threaded_object.start()
-			self.threads_append(threaded_object)
-		self.threads_completed = True
+			self.progress.start(provider_display)
+			self.threads_append(submit(self.progress.run, provider_display, self.get_episode_source, provider, module, pack_arg, name=provider_display))
 
 	def get_movie_source(self, provider, module):
 		sources = external_cache.get(provider, self.media_type, self.tmdb_id, self.title, self.year, '', '')
 		if sources == None:
-			sources = module().sources(self.data, self.host_dict)			
+			with timings.span('provider', provider=provider): sources = module().sources(self.data, self.host_dict)
 			sources = self.process_sources(provider, sources)
 			if not sources: expiry_hours = 1
 			else: expiry_hours = self.single_expiry
 			external_cache.set(provider, self.media_type, self.tmdb_id, self.title, self.year, '', '', sources, expiry_hours)
 		if sources:
-			if not self.background: self.process_quality_count(sources)
+			if not self.background: self.progress.add(sources)
 			self.sources.extend(sources)
+			self.process_stream(sources)
 		del module
 
 	def get_episode_source(self, provider, module, pack):
@@ -145,70 +145,126 @@ class source:
 		else: s_check, e_check = self.season, self.episode
 		sources = external_cache.get(provider, self.media_type, self.tmdb_id, self.title, self.year, s_check, e_check)
 		if sources == None:
-			if pack == 'Show':
-				expiry_hours = self.show_expiry
-				sources = module().sources_packs(self.data, self.host_dict, search_series=True, total_seasons=self.total_seasons)
-			elif pack == 'Season':
-				expiry_hours = self.season_expiry
-				sources = module().sources_packs(self.data, self.host_dict)
-			else:
-				expiry_hours = self.single_expiry
-				sources = module().sources(self.data, self.host_dict)
+			with timings.span('provider', provider=provider, pack=pack):
+				if pack == 'Show':
+					expiry_hours = self.show_expiry
+					sources = module().sources_packs(self.data, self.host_dict, search_series=True, total_seasons=self.total_seasons)
+				elif pack == 'Season':
+					expiry_hours = self.season_expiry
+					sources = module().sources_packs(self.data, self.host_dict)
+				else:
+					expiry_hours = self.single_expiry
+					sources = module().sources(self.data, self.host_dict)
 			sources = self.process_sources(provider, sources)
 			if not sources: expiry_hours = 1
 			external_cache.set(provider, self.media_type, self.tmdb_id, self.title, self.year, s_check, e_check, sources, expiry_hours)
 		if sources:
 			if pack == 'Season': sources = [i for i in sources if not 'episode_start' in i or i['episode_start'] <= self.episode <= i['episode_end']]
 			elif pack == 'Show': sources = [i for i in sources if i['last_season'] >= self.season]
-			if not self.background: self.process_quality_count(sources)
+			if not self.background: self.progress.add(sources)
 			self.sources.extend(sources)
+			self.process_stream(sources)
 		del module
 
-	def process_results(self, results):
-		def _process_duplicates(all_results):
-			unique_urls, unique_hashes = set(), set()
-			unique_urls_add, unique_hashes_add = unique_urls.add, unique_hashes.add
-			for provider in all_results:
-				try:
-					url = provider['url'].lower()
-					if url not in unique_urls:
-						unique_urls_add(url)
-						if 'hash' in provider:
-							_hash = provider['hash']
-							if len(_hash) == 40 and _hash not in unique_hashes:
-								unique_hashes_add(provider['hash'])
-								yield provider
-						else: yield provider
-				except: yield provider
-		def _process_cache_check(provider, function):
+	def process_stream(self, sources):
+		# Results are cache checked as each provider finishes instead of after the whole scrape. Hashes not seen before are queued for every
+		# debrid, and one check job per debrid sends whatever has queued up since its last call, so the checks run alongside the scrape.
+		with self.stream_lock:
+			if not self.stream_open: return
+			sources = [i for i in self.process_duplicates(sources, self.stream_urls, self.stream_hashes) if 'hash' in i]
+		if not sources: return
+		candidates = []
+		if self.autoplay_filter:
+			# Early autoplay. The scrape stops at the first result that passes the autoplay filters and is cached with an enabled debrid.
+			try: candidates = self.autoplay_filter(sources)
+			except: pass
+		hash_list = [i['hash'] for i in sources]
+		submit = worker_pool('debrid').submit
+		with self.stream_lock:
+			if not self.stream_open: return
+			self.autoplay_candidates.extend(candidates)
+			for item in self.active_debrid:
+				self.pending_hashes[item].extend(hash_list)
+				if not item in self.check_jobs: self.check_jobs[item] = submit(self.process_stream_check, *self.debrid_runners[item], name=item)
+
+	def process_stream_check(self, provider, function):
+		while True:
+			with self.stream_lock:
+				hash_list, self.pending_hashes[provider] = self.pending_hashes[provider], []
+				if not hash_list or (self.autoplay_ready.is_set() and not self.stream_open):
+					del self.check_jobs[provider]
+					return
+			try: cached = self.cache_check(provider, function, hash_list, query_local_cache(hash_list))
+			except: continue
+			with self.stream_lock:
+				self.checked_hashes[provider].update(hash_list)
+				self.cached_hashes[provider].update(cached)
+				if cached and any(i['hash'] in cached for i in self.autoplay_candidates):
+					self.autoplay_ready.set()
+					source_utils.result_bus.notify()
+
+	def process_autoplay_results(self):
+		with self.stream_lock:
+			return [dict(i, **{'cache_provider': provider if i['hash'] in self.cached_hashes[provider] else 'Uncached %s' % provider, 'debrid': provider})
+					for i in self.autoplay_candidates for provider in self.active_debrid if i['hash'] in self.checked_hashes[provider]]
+
+	def cache_check(self, provider, function, hash_list, cached_hashes):
+		with timings.span('debrid_check', debrid=provider, hashes=len(hash_list)):
 			if provider in ('Real-Debrid', 'AllDebrid'):
 				if self.external_cache_check: cached = function(hash_list, cached_hashes, self.data, self.active_debrid)
 				else: cached = hash_list
 			else: cached = function(hash_list, cached_hashes)
-			if not self.background: self.process_quality_count_final([i for i in results if i['hash'] in cached])
+		return set(cached)
+
+	def process_duplicates(self, all_results, unique_urls, unique_hashes):
+		unique_urls_add, unique_hashes_add = unique_urls.add, unique_hashes.add
+		for provider in all_results:
+			try:
+				url = provider['url'].lower()
+				if url not in unique_urls:
+					unique_urls_add(url)
+					if 'hash' in provider:
+						_hash = provider['hash']
+						if len(_hash) == 40 and _hash not in unique_hashes:
+							unique_hashes_add(provider['hash'])
+							yield provider
+					else: yield provider
+			except: yield provider
+
+	def process_results(self, results):
+		def _process_cache_check(provider, function):
+			# Only hashes the check jobs did not get to during the scrape are sent now.
+			job = self.check_jobs.get(provider)
+			if job: job.join()
+			with self.stream_lock: checked, cached = self.checked_hashes[provider], set(self.cached_hashes[provider])
+			unchecked = [i for i in hash_list if not i in checked]
+			if unchecked: cached.update(self.cache_check(provider, function, unchecked, query_local_cache(unchecked)))
+			if not self.background: final_progress.add([i for i in results if i['hash'] in cached])
 			final_results.extend([dict(i, **{'cache_provider': provider if i['hash'] in cached else 'Uncached %s' % provider, 'debrid': provider}) for i in results])
 		def _debrid_check_dialog():
 			self.progress_dialog.reset_is_cancelled()
-			start_time, timeout = time.time(), 20
+			start_time, timeout, version = time.time(), 20, 0
+			end_time = start_time + timeout
 			while not self.progress_dialog.iscanceled() and not self.monitor.abortRequested():
 				try:
-					remaining_debrids = [x.getName() for x in debrid_check_threads if x.is_alive() is True]
-					current_progress = max((time.time() - start_time), 0)
-					line1 = ', '.join(remaining_debrids).upper()
-					percent = int((current_progress/float(timeout))*100)
-					self.progress_dialog.update_scraper(self.final_sd, self.final_720p, self.final_1080p, self.final_4k, self.final_total, line1, percent)
-					kodi_utils.sleep(100)
-					if len(remaining_debrids) == 0: break
-					if percent >= 100: break
+					remaining = final_progress.remaining()
+					current_time = time.time()
+					percent = int((max(current_time - start_time, 0)/float(timeout))*100)
+					self.progress_dialog.update_scraper(*final_progress.status(), percent)
+					if remaining == 0 or current_time >= end_time: break
+					version = final_progress.wait(version, end_time)
 				except: pass
 		try:
-			if not self.background and self.all_internal_sources: self.process_quality_count_final(self.all_internal_sources)
+			final_progress = source_utils.ScrapeProgress()
+			if not self.background: final_progress.add(self.all_internal_sources)
 			final_results = []
-			results = list(_process_duplicates(results))
+			results = list(self.process_duplicates(results, set(), set()))
 			hash_list = list(set([i['hash'] for i in results]))
-			cached_hashes = query_local_cache(hash_list)
-			debrid_check_threads = [Thread(target=_process_cache_check, args=self.debrid_runners[item], name=item) for item in self.active_debrid]
-			[i.start() for i in debrid_check_threads]
+			submit = worker_pool('debrid').submit
+			debrid_check_threads = []
+			for item in self.active_debrid:
+				final_progress.start(item)
+				debrid_check_threads.append(submit(final_progress.run, item, _process_cache_check, *self.debrid_runners[item], name=item))
 			if self.background: [i.join() for i in debrid_check_threads]
 			else: _debrid_check_dialog()
 			return final_results
@@ -240,33 +296,12 @@ class source:
 		except: pass
 		return sources
 
-	def process_quality_count(self, sources):
-		for item in self.count_tuple: setattr(self, item[0], getattr(self, item[0]) + item[2](sources, item[1]))
-	
-	def process_quality_count_final(self, sources):
-		for item in self.count_tuple_final: setattr(self, item[0], getattr(self, item[0]) + item[2](sources, item[1]))
-
 	def process_internal_results(self):
 		if self.internal_prescraped and not self.processed_prescrape:
 			self.all_internal_sources += self.prescrape_sources
-			self.process_quality_count(self.prescrape_sources)
+			self.progress.add(self.prescrape_sources)
 			self.processed_prescrape = True
-		for i in self.internal_scrapers:
-			win_property = kodi_utils.get_property('fenlight.internal_results.%s' % i)
-			if win_property in ('checked', '', None): continue
-			try: internal_sources = json.loads(win_property)
-			except: continue
-			kodi_utils.set_property('fenlight.internal_results.%s' % i, 'checked')
+		for i, internal_sources in source_utils.result_bus.collect(self.internal_scrapers):
 			self.all_internal_sources += internal_sources
-			self.processed_internal_scrapers_append(i)
-			self.process_quality_count(internal_sources)
-		return [i for i in self.internal_scrapers if not i in self.processed_internal_scrapers]
-
-	def _quality_length(self, items, quality):
-		return len([i for i in items if i['quality'] == quality])
-
-	def _quality_length_sd(self, items, dummy):
-		return len([i for i in items if i['quality'] in ('SD', 'CAM', 'TELE', 'SYNC')])
-
-	def quality_length_final(self, items, dummy):
-		return len(items)
\ No newline at end of file
+			self.progress.add(internal_sources)
+			self.progress.finish(i)
\ No newline at end of file
@@ -75,6 +75,39 @@ class CustomFonts:
 		except: pass
 		return kodi_utils.logger('Fen Light', 'CustomFonts Service Finished')
 
+class DatabaseCheckpoint:
+	def run(self):
+		kodi_utils.logger('Fen Light', 'DatabaseCheckpoint Service Starting')
+		from caches.base_cache import checkpoint_databases
+		monitor, player = kodi_utils.kodi_monitor(), kodi_utils.kodi_player()
+		wait_for_abort, is_playing = monitor.waitForAbort, player.isPlayingVideo
+		while not monitor.abortRequested():
+			wait_for_abort(900)
+			if is_playing() or kodi_utils.get_property(pause_services_prop) == 'true': continue
+			checkpoint_databases()
+		try: del monitor
+		except: pass
+		try: del player
+		except: pass
+		return kodi_utils.logger('Fen Light', 'DatabaseCheckpoint Service Finished')
+
+class DebridCacheEviction:
+	def run(self):
+		kodi_utils.logger('Fen Light', 'DebridCacheEviction Service Starting')
+		from caches.debrid_cache import debrid_cache
+		monitor, player = kodi_utils.kodi_monitor(), kodi_utils.kodi_player()
+		wait_for_abort, is_playing = monitor.waitForAbort, player.isPlayingVideo
+		while not monitor.abortRequested():
+			wait_for_abort(3600)
+			if is_playing() or kodi_utils.get_property(pause_services_prop) == 'true': continue
+			removed = debrid_cache.remove_expired()
+			if removed: kodi_utils.logger('Fen Light', 'DebridCacheEviction Service - %s Expired Hashes Removed' % removed)
+		try: del monitor
+		except: pass
+		try: del player
+		except: pass
+		return kodi_utils.logger('Fen Light', 'DebridCacheEviction Service Finished')
+
 class TraktMonitor:
 	def run(self):
 		kodi_utils.logger('Fen Light', 'TraktMonitor Service Starting')
@@ -221,6 +254,8 @@ class FenLightMonitor(Monitor):
 		OnUpdateChanges().run()
 		AddonXMLCheck().run()
 		Thread(target=CustomFonts().run).start()
+		Thread(target=DatabaseCheckpoint().run).start()
+		Thread(target=DebridCacheEviction().run).start()
 		Thread(target=TraktMonitor().run).start()
 		Thread(target=UpdateCheck().run).start()
 		Thread(target=WidgetRefresher().run).start()